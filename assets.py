@@ -0,0 +1,154 @@
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import pygame as pg
+import cv2
+
+
+class AssetManager:
+    """
+    Loads every image once, converted to the display's pixel format, and keeps a
+    bounded LRU cache of scaled variants so hot loops never touch the disk or
+    rescale the same source twice.
+
+    specs maps an asset name to (path, size) for pygame surfaces; size may be None.
+    array_specs maps a name to a path for images used as BGR numpy arrays by cv2,
+    or to (path, cv2 imread flags), e.g. cv2.IMREAD_UNCHANGED to keep alpha.
+
+    decode() may run on a background thread while the main thread reads assets;
+    the caches are guarded by a lock and an asset that is still being decoded is
+    waited for instead of being decoded twice.
+    """
+
+    def __init__(self, specs, array_specs=None, max_variants=64, workers=4):
+        self.specs = specs
+        self.array_specs = array_specs or {}
+        self.max_variants = max_variants
+        self.workers = workers
+        self.surfaces = {}
+        self.decoded = {}  # Decoded but not yet converted to the display format
+        self.arrays = {}
+        self.pending = {}  # (kind, name) -> future of a decode in progress
+        self.lock = threading.Lock()
+        self.variants = collections.OrderedDict()  # LRU order, oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, names=None):
+        """
+        Decode the given assets (default: all not yet decoded) in parallel. Does not
+        touch the display, so it can run on a background thread while the UI is up;
+        surfaces are converted on first access or by load().
+        """
+        if names is None:
+            names = list(self.specs) + list(self.array_specs)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            with self.lock:
+                jobs = [("surface", name, self._decode_surface) for name in names
+                        if name in self.specs and name not in self.surfaces and name not in self.decoded]
+                jobs += [("array", name, self._decode_array) for name in names
+                         if name in self.array_specs and name not in self.arrays]
+                futures = []
+                for kind, name, fn in jobs:
+                    if (kind, name) not in self.pending:
+                        self.pending[kind, name] = pool.submit(fn, name)
+                    futures.append(self.pending[kind, name])
+            # Also waits for assets another thread's decode() is already working on
+            for future in wait(futures).done:
+                future.result()
+        return self
+
+    def _decode_surface(self, name):
+        try:
+            path, size = self.specs[name]
+            surface = pg.image.load(path)
+            if size is not None:
+                surface = pg.transform.scale(surface, size)
+            with self.lock:
+                if name not in self.surfaces:
+                    self.decoded[name] = surface
+        finally:
+            with self.lock:
+                self.pending.pop(("surface", name), None)
+
+    def _decode_array(self, name):
+        try:
+            array = cv2.imread(*self._array_spec(name))
+            with self.lock:
+                self.arrays[name] = array
+        finally:
+            with self.lock:
+                self.pending.pop(("array", name), None)
+
+    def _array_spec(self, name):
+        spec = self.array_specs[name]
+        return spec if isinstance(spec, tuple) else (spec, cv2.IMREAD_COLOR)
+
+    def load(self, names=None):
+        """Decode assets in parallel, then convert them on the calling thread (needs a display)."""
+        self.decode(names)
+        with self.lock:
+            for name in list(self.decoded):
+                self._convert_decoded(name)
+        return self
+
+    def _convert_decoded(self, name):
+        # Called with the lock held
+        surface = self.surfaces[name] = self.convert(self.decoded.pop(name))
+        return surface
+
+    @staticmethod
+    def convert(surface):
+        if pg.display.get_surface() is None:
+            return surface
+        if surface.get_flags() & pg.SRCALPHA or surface.get_colorkey() is not None:
+            return surface.convert_alpha()
+        return surface.convert()
+
+    def __getitem__(self, name):
+        surface = self.surfaces.get(name)
+        if surface is None:
+            # Asked for before the background decode finished it: decode it here or wait for it
+            self.decode([name])
+            with self.lock:
+                surface = self.surfaces.get(name) or self._convert_decoded(name)
+        return surface
+
+    def __contains__(self, name):
+        return name in self.surfaces or name in self.decoded
+
+    def _cached(self, key, make):
+        variant = self.variants.get(key)
+        if variant is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return variant
+
+        self.misses += 1
+        variant = make()
+        self.variants[key] = variant
+        if len(self.variants) > self.max_variants:
+            self.variants.popitem(last=False)
+        return variant
+
+    def scaled(self, name, factor, step=0.005):
+        """Surface scaled by factor, quantized to step so animations reuse a few variants."""
+        steps = max(1, round(factor / step))
+        source = self[name]
+
+        def make():
+            size = (int(source.get_width() * steps * step), int(source.get_height() * steps * step))
+            return pg.transform.scale(source, size)
+
+        return self._cached(("surface", name, steps), make)
+
+    def array(self, name):
+        """The source array of an array asset."""
+        source = self.arrays.get(name)
+        if source is None:
+            self.decode([name])
+            source = self.arrays[name]
+        return source
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "variants": len(self.variants)}
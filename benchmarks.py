@@ -0,0 +1,456 @@
+"""
+Headless benchmark suite for the game pipeline.
+
+Runs capture, HandDetector, gesture classification, gesture locking, text and
+asset rendering and the camera preview against a video file (or synthetic
+frames) and recorded landmark fixtures (or synthetic hands), then reports
+per-stage and end-to-end latency percentiles and throughput. Results can be
+stored as a baseline; later runs flag stages whose p50 regressed by more than
+the threshold.
+
+    python benchmarks.py --video clip.mp4 --landmarks hands.npy --save-baseline
+    python benchmarks.py --video clip.mp4 --landmarks hands.npy --threshold 0.2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame as pg
+import numpy as np
+import cv2
+import utils
+from camera import CameraStream, VideoFileSource
+from profiler import Profiler
+from render import Overlay, OverlayCompositor, PreviewCompositor, TextRenderer
+from assets import AssetManager
+
+GESTURE_PATTERNS = {"rock": 0b1111, "paper": 0b0000, "scissors": 0b0011, "Restart": 0b0110, "Explicit": 0b1011}
+
+
+def legacy_preview(frame):
+    """The original draw_camera_feed conversion chain, kept as a baseline."""
+    frame = cv2.flip(frame, 1)
+    frame = cv2.flip(frame, 1)
+    frame = cv2.resize(frame, (320, 250))
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    frame = np.rot90(frame)
+    return pg.surfarray.make_surface(frame)
+
+
+def bench_preview(frames=500, frame=None, profiler=None):
+    """
+    Time the legacy preview chain against PreviewCompositor (per frame into
+    profiler, when given, as the preview_legacy and preview stages) and measure
+    the peak Python-visible allocation of each in a separate tracemalloc pass.
+    """
+    if frame is None:
+        frame = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    profiler = profiler or Profiler()
+    screen = pg.Surface((1280, 720))
+    compositor = PreviewCompositor((320, 250))
+
+    results = {}
+    for name, step in (("preview_legacy", legacy_preview), ("preview", compositor.update)):
+        screen.blit(step(frame), (0, 0))  # Warm up
+        start = time.perf_counter()
+        for _ in range(frames):
+            t = profiler.start()
+            screen.blit(step(frame), (0, 0))
+            profiler.stop(name, t)
+        elapsed = time.perf_counter() - start
+        # Timed apart from the tracemalloc pass, which slows allocations down
+        tracemalloc.start()
+        for _ in range(frames):
+            screen.blit(step(frame), (0, 0))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"ms_per_frame": elapsed / frames * 1000, "peak_alloc_kb": peak / 1024}
+    return results
+
+
+def legacy_overlay(frame, hand, path="images/explicit.png"):
+    """
+    The original explicit overlay, kept as a baseline: read the sprite from
+    disk, resize it to the finger every frame and copy it into the frame
+    without alpha.
+    """
+    explicit = cv2.imread(path)
+    finger_size = np.sqrt((hand[12, 0] - hand[9, 0]) ** 2 + (hand[12, 1] - hand[9, 1]) ** 2)
+    scale_factor = explicit.shape[0] / finger_size
+    explicit_size = [int(explicit.shape[1] / scale_factor), int(explicit.shape[0] / scale_factor)]
+    explicit = cv2.resize(explicit, explicit_size)
+    x, y = int(hand[11, 0] - explicit_size[0] // 2), int(hand[11, 1] - explicit_size[1] // 2)
+    y1, x1 = min(y + explicit_size[1], frame.shape[0]), min(x + explicit_size[0], frame.shape[1])
+    y0, x0 = max(y, 0), max(x, 0)
+    try:
+        frame[y0:y1, x0:x1] = explicit[:y1 - y0, :x1 - x0]
+    except ValueError:
+        pass  # Sprites crossing the top or left edge did not fit (the original swallowed this)
+
+
+def bench_overlay(frames=500, frame=None, profiler=None):
+    """
+    Overlay cost per frame: the legacy path against OverlayCompositor with an
+    opaque sprite, an alpha one and three alpha ones. Timings go into profiler,
+    when given, as overlay_<variant> stages; peak allocations are measured in
+    a separate tracemalloc pass after the size caches are warm.
+    """
+    rng = np.random.default_rng(0)
+    if frame is None:
+        frame = rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    profiler = profiler or Profiler()
+    hands = synthetic_hands(["Explicit"] * frames, rng, center=(frame.shape[1] / 2, frame.shape[0] / 2), noise=3.0)
+    compositor = OverlayCompositor()
+    compositor.add_sprite("explicit", cv2.imread("images/explicit.png", cv2.IMREAD_UNCHANGED))
+    compositor.add_sprite("explicit_alpha", cv2.imread("images/explicit.png", cv2.IMREAD_UNCHANGED), opacity=0.7)
+    several = [Overlay("explicit_alpha", anchor=anchor, scale=0.6) for anchor in (8, 12, 16)]
+
+    results = {}
+    for name, step in (("overlay_legacy", lambda hand: legacy_overlay(frame, hand)),
+                       ("overlay_opaque", lambda hand: compositor.draw(frame, hand, [Overlay("explicit")])),
+                       ("overlay_alpha", lambda hand: compositor.draw(frame, hand, [Overlay("explicit_alpha")])),
+                       ("overlay_alpha_x3", lambda hand: compositor.draw(frame, hand, several))):
+        for hand in hands:  # Warm up, filling the size caches
+            step(hand)
+        start = time.perf_counter()
+        for hand in hands:
+            t = profiler.start()
+            step(hand)
+            profiler.stop(name, t)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        for hand in hands:
+            step(hand)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"us_per_frame": elapsed / frames * 1e6, "peak_alloc_kb": peak / 1024}
+    return results
+
+
+def synthetic_hands(gestures, rng, center=(640, 360), scale=1.5, noise=2.0, bends=None):
+    """
+    (n, 21, 2) landmarks of upright hands showing the given gestures, with pixel
+    noise. bends optionally gives each finger's bend at the middle joint in
+    degrees, shape (n, 4); 90 is the open/closed threshold.
+    """
+    n = len(gestures)
+    hands = np.zeros((n, 21, 2), dtype=np.float32)
+    # Thumb: a short chain out to the side
+    hands[:, 1:5] = [(-35, -20), (-55, -40), (-70, -55), (-80, -65)]
+    for i, gesture in enumerate(gestures):
+        pattern = GESTURE_PATTERNS.get(gesture, 0b0101)
+        for finger in range(4):
+            x = -25 + 18 * finger
+            closed = pattern >> (3 - finger) & 1
+            base = 5 + 4 * finger
+            hands[i, base] = (x, -80)
+            hands[i, base + 1] = (x, -120)
+            if bends is None:
+                # Closed fingers fold back towards the wrist
+                hands[i, base + 2:base + 4] = [(x, -105), (x, -85)] if closed else [(x, -150), (x, -175)]
+            else:
+                # Bent away from the wrist-to-joint direction, which the angle test measures against
+                angle = np.radians(bends[i][finger]) + np.arctan2(x, 120)
+                direction = np.array([np.sin(angle), -np.cos(angle)])
+                hands[i, base + 2:base + 4] = [(x, -120) + 30 * direction, (x, -120) + 55 * direction]
+    hands = hands * scale + center
+    hands += rng.normal(0, noise, hands.shape).astype(np.float32)
+    return hands
+
+
+def loose_poses(gestures, rng, slack=25.0):
+    """
+    Finger bends for synthetic_hands as real players hold a pose: each run of a
+    gesture gets fingers bent anywhere from firmly to loosely, up to slack degrees
+    from the 90 degree threshold.
+    """
+    bends = np.zeros((len(gestures), 4))
+    start = 0
+    for i in range(1, len(gestures) + 1):
+        if i == len(gestures) or gestures[i] != gestures[start]:
+            pattern = GESTURE_PATTERNS.get(gestures[start], 0b0101)
+            closed = np.array([pattern >> (3 - finger) & 1 for finger in range(4)], dtype=bool)
+            offset = rng.uniform(5, 90 - 5, 4)
+            offset[rng.random(4) < 0.3] = rng.uniform(3, slack)  # Loosely held fingers near the threshold
+            bends[start:i] = np.where(closed, 90 + offset, 90 - offset)
+            start = i
+    return bends
+
+
+def synthetic_sequence(frames, rng):
+    """Gesture sequence held in runs of a few frames, like a player settling on a choice."""
+    gestures = []
+    names = list(GESTURE_PATTERNS) + ["Unknown"]
+    while len(gestures) < frames:
+        gestures += [names[rng.integers(len(names))]] * int(rng.integers(1, 15))
+    return gestures[:frames]
+
+
+def gesture_fixture(frames, rng, noise=6.0):
+    """
+    Hand sequence with known gestures for lock-in latency: runs of 20-60 frames,
+    loosely held poses, 4-frame transitions and MediaPipe-like landmark jitter.
+    Returns (landmarks, gestures).
+    """
+    names = [name for name in GESTURE_PATTERNS]
+    gestures = []
+    while len(gestures) < frames:
+        gestures += [names[rng.integers(len(names))]] * int(rng.integers(20, 60))
+    gestures = gestures[:frames]
+    bends = loose_poses(gestures, rng)
+    # Fingers move into a new pose over a few frames rather than at once
+    padded = np.concatenate([bends[:1].repeat(3, axis=0), bends])
+    bends = np.lib.stride_tricks.sliding_window_view(padded, 4, axis=0).mean(axis=-1)
+    return synthetic_hands(gestures, rng, noise=noise, bends=bends), gestures
+
+
+def reference_gestures(landmarks, window=9):
+    """Offline labels for a recorded fixture without ground truth: gestures of a centred median over window frames."""
+    padded = np.pad(landmarks, ((window // 2, window // 2), (0, 0), (0, 0)), mode="edge")
+    median = np.median(np.lib.stride_tricks.sliding_window_view(padded, window, axis=0), axis=-1)
+    return utils.classify_batch(median).tolist()
+
+
+def frames_to_lock(landmarks, gestures, fps=30.0, smooth=False, min_run=15):
+    """
+    Frames from the start of every gesture run (of at least min_run frames) until
+    GestureStabilizer locks that gesture, classifying the raw landmarks or the
+    HandFilter output. Runs that never lock are counted as missed.
+    """
+    stabilizer = utils.GestureStabilizer(limit=5)
+    hand_filter = utils.HandFilter(1)
+    locked = []
+    for i, hand in enumerate(landmarks):
+        gesture = hand_filter.update(hand[None], [0], i / fps)[0] if smooth else utils.classify_batch(hand)
+        locked.append(stabilizer.update(gesture, i / fps))
+
+    delays, missed, start = [], 0, 0
+    for i in range(1, len(gestures) + 1):
+        if i < len(gestures) and gestures[i] == gestures[start]:
+            continue
+        if i - start >= min_run and gestures[start] != "Unknown":
+            delay = next((j - start for j in range(start, i) if locked[j] == gestures[start]), None)
+            if delay is None:
+                missed += 1
+            else:
+                delays.append(delay)
+        start = i
+    runs = len(delays) + missed
+    delays = np.array(delays or [np.nan])
+    return {"runs": runs, "mean_frames": float(np.mean(delays)),
+            "p95_frames": float(np.percentile(delays, 95)), "missed": missed}
+
+
+def lock_latency(landmarks=None, frames=6000, noise=(2.0, 4.0, 8.0)):
+    """frames_to_lock with and without smoothing, on a landmark fixture or synthetic ones at each noise level."""
+    results = {}
+    if landmarks:
+        fixture = load_fixture(landmarks, frames, None)
+        fixtures = {os.path.basename(landmarks): (fixture, reference_gestures(fixture))}
+    else:
+        fixtures = {f"synthetic_noise_{level:g}px": gesture_fixture(frames, np.random.default_rng(2), level) for level in noise}
+    for name, (fixture, gestures) in fixtures.items():
+        results[name] = {"raw": frames_to_lock(fixture, gestures), "filtered": frames_to_lock(fixture, gestures, smooth=True)}
+    return results
+
+
+def load_fixture(path, frames, rng):
+    """Landmark fixture (frames, 21, 2) from a .npy file or a landmark recording, or a synthetic one."""
+    if path and path.endswith(".bin"):
+        from recording import LandmarkRecording
+        hands = LandmarkRecording(path).primary_hands()
+        return np.ascontiguousarray(hands[~np.isnan(hands[:, 0, 0])][:frames])
+    if path:
+        landmarks = np.load(path, mmap_mode="r")
+        return np.ascontiguousarray(landmarks.reshape(-1, 21, 2)[:frames], dtype=np.float32)
+    return synthetic_hands(synthetic_sequence(frames, rng), rng)
+
+
+def open_frames(video, shape=(480, 640, 3)):
+    """A camera stand-in: the video file without real-time pacing, or synthetic noise frames."""
+    if video:
+        return VideoFileSource(video, realtime=False)
+
+    class NoiseSource:
+        def __init__(self):
+            self.frames = np.random.default_rng(1).integers(0, 256, (8,) + shape, dtype=np.uint8)
+            self.index = 0
+
+        def read(self, image=None):
+            self.index += 1
+            return True, self.frames[self.index % len(self.frames)]
+
+        def isOpened(self):
+            return True
+
+        def release(self):
+            pass
+
+    return NoiseSource()
+
+
+def run_suite(video=None, landmarks=None, frames=300, detector_frames=60):
+    rng = np.random.default_rng(0)
+    profiler = Profiler(enabled=True, size=max(frames, detector_frames) * 4)
+    pg.init()
+    screen = pg.display.set_mode((1280, 720))
+    offscreen = pg.Surface((1280, 720)).convert()
+    fixture = load_fixture(landmarks, frames, rng)
+    gestures = utils.classify_batch(fixture).tolist()
+
+    # Capture
+    stream = CameraStream(open_frames(video)).start()
+    for _ in range(frames):
+        t = profiler.start()
+        ret, frame = stream.read()
+        profiler.stop("capture", t)
+    frame = frame.copy()
+
+    # HandDetector (real MediaPipe inference)
+    detector = utils.HandDetector(detection_con=0.75, tracking=True, draw=False)
+    for _ in range(detector_frames):
+        ret, img = stream.read()
+        t = profiler.start()
+        detector.find_hands(img)
+        profiler.stop("find_hands", t)
+
+    # Classification, one hand at a time and as one batch
+    for hand in fixture:
+        t = profiler.start()
+        utils.finger_combo(hand)
+        profiler.stop("finger_combo", t)
+    t = profiler.start()
+    utils.classify_batch(fixture)
+    profiler.stop("classify_batch", t)
+    hand_filter = utils.HandFilter(1)
+    for i, hand in enumerate(fixture):
+        t = profiler.start()
+        hand_filter.update(hand[None], [0], i / 30)
+        profiler.stop("hand_filter", t)
+
+    # Gesture locking: legacy history scan against the streaming stabilizer
+    history = []
+    for gesture in gestures:
+        history.append(gesture)
+        t = profiler.start()
+        utils.check_locked_gesture(history, limit=5)
+        profiler.stop("check_locked_gesture", t)
+    stabilizer = utils.GestureStabilizer(limit=5)
+    for gesture in gestures:
+        t = profiler.start()
+        stabilizer.update(gesture)
+        profiler.stop("stabilizer", t)
+
+    # Text and asset rendering into an offscreen surface
+    text_renderer = TextRenderer("font.ttf")
+    images = AssetManager({"hands": ("images/hands.png", None), "rock": ("images/rock.png", None)}).load()
+    for i in range(frames):
+        t = profiler.start()
+        offscreen.blit(text_renderer.render(f"Player's score:   {i // 50}", 50, (168, 83, 76)), (900, 50))
+        offscreen.blit(text_renderer.render("Shoot!", 100, (168, 83, 76)), (540, 260))
+        profiler.stop("text", t)
+        t = profiler.start()
+        offscreen.blit(images.scaled("hands", 0.75 + 0.1 * abs(np.sin(i / 30))), (400, 150))
+        offscreen.blit(images["rock"], (100, 100))
+        profiler.stop("assets", t)
+
+    # Camera preview, with the allocation budget of both chains
+    allocations = bench_preview(frames, frame, profiler)
+    preview = PreviewCompositor((320, 250))
+
+    # Landmark-anchored overlays: the legacy per-frame resize and copy against cached alpha blending
+    allocations.update(bench_overlay(frames, frame.copy(), profiler))
+
+    # End to end: capture -> landmarks -> classify -> lock -> text -> preview -> compose
+    stabilizer = utils.GestureStabilizer(limit=5)
+    for i in range(frames):
+        start = t = profiler.start()
+        ret, img = stream.read()
+        if i < detector_frames:
+            detector.find_hands(img)
+        hand = detector.landmarks[0] if len(detector.landmarks) else fixture[i % len(fixture)]
+        stabilizer.update(utils.finger_combo(hand))
+        offscreen.blit(text_renderer.render(f"Bot's score:   {i // 50}", 50, (168, 83, 76)), (100, 50))
+        offscreen.blit(preview.update(img), (480, 420))
+        screen.blit(offscreen, (0, 0))
+        profiler.stop("end_to_end" if i < detector_frames else "end_to_end_no_inference", start)
+
+    stream.release()
+    results = profiler.summary()
+    for name, stats in results.items():
+        stats["per_second"] = 1000 / stats["mean_ms"] if stats["mean_ms"] else float("inf")
+    results["classify_batch"]["hands_per_second"] = len(fixture) * results["classify_batch"]["per_second"]
+    for name, stats in allocations.items():
+        results[name]["peak_alloc_kb"] = stats["peak_alloc_kb"]
+    return results
+
+
+def compare(results, baseline, threshold, alloc_slack_kb=1.0):
+    """
+    Stages whose p50 is more than threshold slower than the baseline, or whose
+    peak allocation grew by more than threshold (plus alloc_slack_kb of
+    tracemalloc noise). Returns (stage, metric, before, after) tuples.
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p50_ms"] > 0 and stats["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append((name, "p50_ms", base["p50_ms"], stats["p50_ms"]))
+        if "peak_alloc_kb" in base and stats.get("peak_alloc_kb", 0) > base["peak_alloc_kb"] * (1 + threshold) + alloc_slack_kb:
+            regressions.append((name, "peak_alloc_kb", base["peak_alloc_kb"], stats["peak_alloc_kb"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the Rock-Paper-Scissors pipeline.")
+    parser.add_argument("--video", help="Video file used as the camera (default: synthetic frames)")
+    parser.add_argument("--landmarks", help=".npy landmark fixture of shape (frames, 21, 2) or a landmark recording (default: synthetic hands)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--detector-frames", type=int, default=60)
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown before flagging a regression")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.video, args.landmarks, args.frames, args.detector_frames)
+    print(f"{'stage':<26}{'p50':>9}{'p95':>9}{'p99':>9}{'per s':>12}{'peak KB':>9}")
+    for name, stats in results.items():
+        alloc = f"{stats['peak_alloc_kb']:9.1f}" if "peak_alloc_kb" in stats else ""
+        print(f"{name:<26}{stats['p50_ms']:9.3f}{stats['p95_ms']:9.3f}{stats['p99_ms']:9.3f}{stats['per_second']:12.0f}{alloc}")
+
+    # Gesture lock-in latency with and without the landmark filter
+    locks = lock_latency(args.landmarks)
+    print(f"\n{'frames to lock':<26}{'raw mean':>9}{'p95':>6}{'miss':>6}{'filtered':>10}{'p95':>6}{'miss':>6}")
+    for name, lock in locks.items():
+        raw, filtered = lock["raw"], lock["filtered"]
+        print(f"{name:<26}{raw['mean_frames']:9.2f}{raw['p95_frames']:6.1f}{raw['missed']:6d}"
+              f"{filtered['mean_frames']:10.2f}{filtered['p95_frames']:6.1f}{filtered['missed']:6d}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**results, "lock_latency": locks}, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name}: {metric} {before:.3f} -> {after:.3f}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+Bot strategies and a tournament simulator.
+
+Every bot plays n independent games at once: choose() returns the bot's move
+index (see utils.MOVES) for each game as an (n,) array and observe() takes the
+players' moves of the round just played. The game uses n=1; the simulator runs
+thousands of games side by side, so each round of a tournament is a handful of
+NumPy operations no matter how many games there are.
+
+    python bots.py --games 2000 --rounds 500
+    python bots.py --games 2000 --rounds 500 --moves labels/session1.mp4.csv
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import numpy as np
+import utils
+
+
+TIE_BREAK = np.eye(3) * 1e-9
+
+
+class Bot:
+    """Interface for bot strategies; the base class plays uniformly at random."""
+
+    name = "uniform"
+
+    def __init__(self, games=1, rng=None, batch=4096):
+        self.games = games
+        self.rng = rng or np.random.default_rng()
+        self.batch = batch
+        self.random_moves = np.empty((0, games), dtype=np.int64)
+        self.random_index = 0
+
+    def random(self):
+        """(games,) uniformly random moves, drawn from the generator in batches."""
+        if self.random_index == len(self.random_moves):
+            self.random_moves = self.rng.integers(0, 3, (max(1, self.batch // self.games), self.games))
+            self.random_index = 0
+        self.random_index += 1
+        return self.random_moves[self.random_index - 1]
+
+    def choose(self):
+        return self.random()
+
+    def observe(self, player_moves):
+        pass
+
+    def reset(self):
+        pass
+
+    def move(self):
+        """Single-game helper for the game loop: the bot's move as a name."""
+        return utils.MOVES[self.choose()[0]]
+
+
+class UniformBot(Bot):
+    """Unexploitable baseline: every move with probability 1/3."""
+
+
+class FrequencyBot(Bot):
+    """
+    Counts the player's moves (with exponential decay, so old habits fade) and
+    plays the move that beats the most frequent one.
+    """
+
+    name = "frequency"
+
+    def __init__(self, games=1, rng=None, decay=0.95, **kwargs):
+        super().__init__(games, rng, **kwargs)
+        self.decay = decay
+        self.counts = np.zeros((games, 3))
+        self.rows = np.arange(games)
+
+    def choose(self):
+        # Ties (including no history) go to a random move
+        predicted = (self.counts + TIE_BREAK[self.random()]).argmax(axis=1)
+        return (predicted + 1) % 3
+
+    def observe(self, player_moves):
+        self.counts *= self.decay
+        self.counts[self.rows, player_moves] += 1
+
+    def reset(self):
+        self.counts[:] = 0
+
+
+class MarkovBot(Bot):
+    """
+    n-gram predictor: for every context of the player's last order moves it
+    keeps decayed counts of the move that followed, predicts the likeliest next
+    move and plays what beats it. With several orders it follows whichever has
+    predicted best recently. Updates are O(1) per game and memory is bounded by
+    3**order contexts.
+    """
+
+    name = "markov"
+
+    def __init__(self, games=1, rng=None, orders=(1, 2), decay=0.9, score_decay=0.9, **kwargs):
+        super().__init__(games, rng, **kwargs)
+        self.orders = orders
+        self.decay = decay
+        self.score_decay = score_decay
+        self.tables = [np.zeros((games, 3 ** order, 3)) for order in orders]
+        self.contexts = np.zeros((len(orders), games), dtype=np.int64)
+        self.scores = np.zeros((len(orders), games))
+        self.predictions = np.zeros((len(orders), games), dtype=np.int64)
+        self.rows = np.arange(games)
+
+    def choose(self):
+        for i, table in enumerate(self.tables):
+            counts = table[self.rows, self.contexts[i]]
+            # Unseen contexts predict a random move
+            self.predictions[i] = np.where(counts.max(axis=1) > 0, counts.argmax(axis=1), self.random())
+        best = self.scores.argmax(axis=0)
+        return (self.predictions[best, self.rows] + 1) % 3
+
+    def observe(self, player_moves):
+        self.scores *= self.score_decay
+        self.scores += self.predictions == player_moves
+        for i, (order, table) in enumerate(zip(self.orders, self.tables)):
+            table[self.rows, self.contexts[i]] *= self.decay
+            table[self.rows, self.contexts[i], player_moves] += 1
+            self.contexts[i] = (self.contexts[i] * 3 + player_moves) % 3 ** order
+
+    def reset(self):
+        for table in self.tables:
+            table[:] = 0
+        self.contexts[:] = 0
+        self.scores[:] = 0
+
+
+BOTS = {"uniform": UniformBot, "frequency": FrequencyBot, "markov": MarkovBot}
+
+
+def make_bot(name, games=1, rng=None, **kwargs):
+    return BOTS[name](games, rng, **kwargs)
+
+
+class SequencePlayer:
+    """Plays a fixed (scripted or recorded) move sequence, each game starting at a random offset."""
+
+    def __init__(self, name, sequence, games, rng):
+        self.name = name
+        self.sequence = np.asarray(sequence, dtype=np.int64)
+        self.offsets = rng.integers(0, len(self.sequence), games)
+
+    def moves(self, round_index, bot_moves):
+        return self.sequence[(self.offsets + round_index) % len(self.sequence)]
+
+
+class BiasedPlayer:
+    """Independent moves with fixed probabilities, drawn for all games and rounds in one batch."""
+
+    def __init__(self, name, probabilities, games, rounds, rng):
+        self.name = name
+        self.table = rng.choice(3, size=(rounds, games), p=probabilities)
+
+    def moves(self, round_index, bot_moves):
+        return self.table[round_index]
+
+
+class CounterPlayer:
+    """Plays what would have beaten the bot's previous move, mistaking it with probability noise."""
+
+    def __init__(self, name, games, rounds, rng, noise=0.2):
+        self.name = name
+        self.mistakes = rng.random((rounds, games)) < noise
+        self.random = rng.integers(0, 3, (rounds, games))
+
+    def moves(self, round_index, bot_moves):
+        moves = (bot_moves + 1) % 3
+        return np.where(self.mistakes[round_index], self.random[round_index], moves)
+
+
+def read_moves(path):
+    """
+    Player moves from a label.py timeline CSV (held gestures, one per run of
+    frames) or a text file of move names. Returns move indexes.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            gestures = [row["gesture"] for row in csv.DictReader(f)]
+        # A held gesture is one move; repeats of the same frame label are the same move
+        gestures = [g for i, g in enumerate(gestures) if i == 0 or g != gestures[i - 1]]
+    else:
+        with open(path) as f:
+            gestures = f.read().replace(",", " ").split()
+    return [utils.MOVE_INDEX[g] for g in gestures if g in utils.MOVE_INDEX]
+
+
+def scripted_players(games, rounds, rng, recorded=None):
+    players = [
+        SequencePlayer("cycle", [0, 1, 2], games, rng),
+        SequencePlayer("rock_rock_paper", [0, 0, 1], games, rng),
+        BiasedPlayer("uniform", [1 / 3, 1 / 3, 1 / 3], games, rounds, rng),
+        BiasedPlayer("rock_heavy", [0.5, 0.25, 0.25], games, rounds, rng),
+        CounterPlayer("beat_last", games, rounds, rng),
+    ]
+    if recorded:
+        players.append(SequencePlayer("recorded", recorded, games, rng))
+    return players
+
+
+def play(bot, player, rounds):
+    """
+    Play rounds between a bot and a player over all their games. Returns the
+    bot's (wins, draws, losses) summed over games and the time spent in the bot.
+    """
+    totals = np.zeros(3, dtype=np.int64)  # Indexed by utils.OUTCOMES: draw, player win, bot win
+    bot_moves = np.zeros(bot.games, dtype=np.int64)
+    bot_time = 0.0
+    for round_index in range(rounds):
+        player_moves = player.moves(round_index, bot_moves)
+        start = time.perf_counter()
+        bot_moves = bot.choose()
+        bot_time += time.perf_counter() - start
+        totals += np.bincount(utils.OUTCOMES[player_moves, bot_moves], minlength=3)
+        start = time.perf_counter()
+        bot.observe(player_moves)
+        bot_time += time.perf_counter() - start
+    return (int(totals[2]), int(totals[0]), int(totals[1])), bot_time
+
+
+def decision_cost(name, decisions=2000):
+    """Microseconds per choose() + observe() of a single-game bot, as used in the frame loop."""
+    bot = make_bot(name, 1, np.random.default_rng(0))
+    moves = np.random.default_rng(1).integers(0, 3, (decisions, 1))
+    start = time.perf_counter()
+    for move in moves:
+        bot.choose()
+        bot.observe(move)
+    return (time.perf_counter() - start) / decisions * 1e6
+
+
+def tournament(games=1000, rounds=1000, recorded=None, seed=0):
+    """Every bot against every scripted (and recorded) player; win rates and costs per bot."""
+    results = {}
+    for name in BOTS:
+        rng = np.random.default_rng(seed)
+        results[name] = {"players": {}, "decision_us": decision_cost(name)}
+        bot_time = 0.0
+        for player in scripted_players(games, rounds, rng, recorded):
+            bot = make_bot(name, games, rng)
+            (wins, draws, losses), elapsed = play(bot, player, rounds)
+            bot_time += elapsed
+            total = wins + draws + losses
+            results[name]["players"][player.name] = {
+                "win": wins / total, "draw": draws / total, "loss": losses / total}
+        rates = results[name]["players"].values()
+        results[name]["mean_win"] = float(np.mean([r["win"] for r in rates]))
+        results[name]["worst_margin"] = float(min(r["win"] - r["loss"] for r in rates))
+        results[name]["batched_ns_per_decision"] = bot_time / (games * rounds * len(rates)) * 1e9
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate bot strategies against scripted and recorded players.")
+    parser.add_argument("--games", type=int, default=1000, help="Independent games played side by side")
+    parser.add_argument("--rounds", type=int, default=1000, help="Rounds per game")
+    parser.add_argument("--moves", help="Recorded player moves: a label.py timeline CSV or a text file of move names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    recorded = read_moves(args.moves) if args.moves else None
+    start = time.perf_counter()
+    results = tournament(args.games, args.rounds, recorded, args.seed)
+    elapsed = time.perf_counter() - start
+    players = list(next(iter(results.values()))["players"])
+    rounds = args.games * args.rounds * len(players) * len(results)
+
+    print(f"{'bot':<11}" + "".join(f"{p:>17}" for p in players) + f"{'us/move':>9}{'ns/batched':>11}")
+    for name, result in results.items():
+        cells = "".join(f"{r['win'] * 100:7.1f}/{r['loss'] * 100:4.1f}%    " for r in result["players"].values())
+        print(f"{name:<11}{cells}{result['decision_us']:9.1f}{result['batched_ns_per_decision']:11.1f}")
+    print(f"Bot win/loss rates. {rounds:,} rounds in {elapsed:.1f} s ({rounds / elapsed / 1e6:.1f} M rounds/s).")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
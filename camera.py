@@ -0,0 +1,484 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+import cv2
+
+# Capture modes tried during negotiation, smallest first
+RESOLUTIONS = [(320, 240), (424, 240), (640, 360), (640, 480), (800, 448), (848, 480), (960, 540),
+               (1024, 576), (1280, 720), (1600, 896), (1920, 1080)]
+# Compressed first: over USB 2 uncompressed YUYV usually cannot keep 30 fps above 640x480
+FOURCCS = ("MJPG", "YUYV")
+PROFILE_PATH = os.environ.get("RPS_CAMERA_PROFILES", os.path.expanduser("~/.cache/rps_camera_profiles.json"))
+
+
+class FrameRing:
+    """Small ring of reusable frame slots that always hands out the newest frame."""
+
+    def __init__(self, size=3):
+        # Three slots are the minimum so the writer always has a slot that is
+        # neither the newest frame nor the one the consumer is still holding
+        self.size = max(3, size)
+        self.frames = [None] * self.size
+        self.frame_ids = [0] * self.size
+        self.timestamps = [0.0] * self.size
+        self.latest = -1  # Slot index of the newest frame
+        self.held = -1  # Slot index last handed to the consumer
+        self.cond = threading.Condition()
+
+    def write_slot(self):
+        """Return a slot index the writer may fill without racing the consumer."""
+        with self.cond:
+            index = (self.latest + 1) % self.size
+            while index == self.held or index == self.latest:
+                index = (index + 1) % self.size
+            return index
+
+    def commit(self, index, frame, frame_id, timestamp):
+        """Publish a filled slot as the newest frame and wake the consumer."""
+        with self.cond:
+            self.frames[index] = frame
+            self.frame_ids[index] = frame_id
+            self.timestamps[index] = timestamp
+            self.latest = index
+            self.cond.notify_all()
+
+    def newest(self, after_id=0, timeout=None):
+        """Wait for a frame newer than after_id and return (frame_id, timestamp, frame)."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.latest >= 0 and self.frame_ids[self.latest] > after_id, timeout):
+                return 0, 0.0, None
+            self.held = self.latest
+            return self.frame_ids[self.held], self.timestamps[self.held], self.frames[self.held]
+
+    def buffer(self, index):
+        return self.frames[index]
+
+
+class CameraStream:
+    """
+    Reads frames from a cv2.VideoCapture-like source on a background thread.
+    read() mirrors cv2.VideoCapture.read() but returns the newest frame only; frames
+    the consumer was too slow to pick up are dropped and counted.
+    A returned frame stays valid until the next call to read().
+    """
+
+    def __init__(self, source, buffer_size=3, read_timeout=1.0):
+        self.source = source
+        self.ring = FrameRing(buffer_size)
+        self.read_timeout = read_timeout
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.capture_fps = 0.0  # Smoothed rate at which the source delivers frames
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.last_frame_id = 0
+        self.frame_age = 0.0  # Age of the last delivered frame in seconds
+        self.avg_frame_age = 0.0
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, name="camera-reader", daemon=True)
+        self.thread.start()
+        return self
+
+    def _reader(self):
+        last = None
+        while self.running:
+            index = self.ring.write_slot()
+            # Let the source decode into the slot's old buffer when the shape still matches
+            ret, frame = self.source.read(self.ring.buffer(index))
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+            now = time.perf_counter()
+            if last is not None and now > last:
+                self.capture_fps += (1 / (now - last) - self.capture_fps) * (0.1 if self.capture_fps else 1.0)
+            last = now
+            self.frames_captured += 1
+            self.ring.commit(index, frame, self.frames_captured, now)
+
+    def read(self, timeout=None):
+        """Return (ret, frame) for the newest frame not delivered yet."""
+        if not self.running:
+            self.start()
+        frame_id, timestamp, frame = self.ring.newest(self.last_frame_id, timeout if timeout is not None else self.read_timeout)
+        if frame is None:
+            return False, None
+
+        self.frames_dropped += frame_id - self.last_frame_id - 1
+        self.frames_delivered += 1
+        self.last_frame_id = frame_id
+        self.frame_age = time.perf_counter() - timestamp
+        self.avg_frame_age += (self.frame_age - self.avg_frame_age) * 0.1
+        return True, frame
+
+    def stats(self):
+        return {
+            "captured": self.frames_captured,
+            "delivered": self.frames_delivered,
+            "dropped": self.frames_dropped,
+            "read_failures": self.read_failures,
+            "capture_fps": self.capture_fps,
+            "frame_age_ms": self.frame_age * 1000,
+            "avg_frame_age_ms": self.avg_frame_age * 1000,
+        }
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def get(self, prop):
+        return self.source.get(prop)
+
+    def set(self, prop, value):
+        return self.source.set(prop, value)
+
+    def release(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.source.release()
+
+
+class VideoFileSource:
+    """
+    Stand-in for a webcam backed by a video file, so the capture path can run
+    without a camera. Frames are paced at the file's frame rate (or fps) and the
+    video loops when it reaches the end.
+    """
+
+    def __init__(self, path, fps=None, loop=True, realtime=True):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.loop = loop
+        self.realtime = realtime
+        self.next_time = time.perf_counter()
+
+    def read(self, image=None):
+        if self.realtime:
+            delay = self.next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_time = max(self.next_time, time.perf_counter() - 1 / self.fps) + 1 / self.fps
+
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class SimulatedCamera:
+    """
+    Stand-in for a UVC webcam with a fixed list of modes, so capture negotiation
+    can run without hardware. Modes map (fourcc, width, height) to the highest
+    frame rate the device delivers in them; set() snaps requests to a supported
+    mode like a driver does. Frames are produced on the device's own clock and
+    up to buffer_size of them queue up in the "driver", so a reader that falls
+    behind gets stale frames just as with a real camera.
+    """
+
+    # A typical USB 2 webcam: uncompressed modes above 640x480 cannot keep up
+    MODES = {
+        ("MJPG", 320, 240): 30, ("MJPG", 640, 360): 30, ("MJPG", 640, 480): 30,
+        ("MJPG", 1280, 720): 30, ("MJPG", 1920, 1080): 30,
+        ("YUYV", 320, 240): 30, ("YUYV", 640, 360): 30, ("YUYV", 640, 480): 30,
+        ("YUYV", 1280, 720): 10, ("YUYV", 1920, 1080): 5,
+    }
+
+    def __init__(self, modes=None, mode=("YUYV", 1280, 720), buffer_size=4, honor_buffer_size=True,
+                 name="Simulated Camera"):
+        self.modes = modes or self.MODES
+        self.name = name
+        self.fourcc, self.width, self.height = mode
+        self.requested = (self.width, self.height)
+        self.fps = self.modes[mode]
+        self.buffer_size = buffer_size
+        self.honor_buffer_size = honor_buffer_size
+        self.opened = True
+        self._restart()
+
+    def _restart(self):
+        # A mode change restarts streaming, like STREAMOFF/STREAMON
+        self.clock = time.perf_counter()
+        self.last_index = -1
+
+    def _snap(self):
+        """Smallest mode of the current format covering the requested size, else the largest one."""
+        sizes = sorted((w, h) for fourcc, w, h in self.modes if fourcc == self.fourcc)
+        width, height = next(((w, h) for w, h in sizes if w >= self.requested[0] and h >= self.requested[1]), sizes[-1])
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.fps = self.modes[(self.fourcc, width, height)]
+            self._restart()
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        interval = 1 / self.fps
+        newest = int((time.perf_counter() - self.clock) / interval)
+        # The oldest frame still queued; older ones were overwritten
+        index = max(self.last_index + 1, newest - self.buffer_size + 1)
+        delay = self.clock + index * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_index = index
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image.fill(index % 256)
+        return True, image
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FOURCC:
+            return float(cv2.VideoWriter_fourcc(*self.fourcc))
+        if prop == cv2.CAP_PROP_BUFFERSIZE:
+            return float(self.buffer_size)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FOURCC:
+            fourcc = fourcc_name(value)
+            if not any(mode[0] == fourcc for mode in self.modes):
+                return False
+            self.fourcc, self.width = fourcc, 0  # Force the size to be snapped for the new format
+            self._snap()
+        elif prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                self.requested = (int(value), self.requested[1])
+            else:
+                self.requested = (self.requested[0], int(value))
+            self._snap()
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = min(max(1.0, value), self.modes[(self.fourcc, self.width, self.height)])
+            self._restart()
+        elif prop == cv2.CAP_PROP_BUFFERSIZE:
+            if not self.honor_buffer_size:
+                return False
+            self.buffer_size = max(1, int(value))
+        else:
+            return False
+        return True
+
+    def release(self):
+        self.opened = False
+
+
+def fourcc_name(code):
+    code = int(code)
+    return "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def device_key(source, cap=None):
+    """Stable name for a capture device, used to key its saved profile."""
+    if isinstance(source, int):
+        try:
+            with open(f"/sys/class/video4linux/video{source}/name") as f:
+                return f"{f.read().strip()} (video{source})"
+        except OSError:
+            pass
+    return getattr(cap, "name", None) or str(source)
+
+
+def current_mode(cap):
+    return {
+        "fourcc": fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def apply_mode(cap, mode):
+    """Request a mode and return the one the driver actually chose."""
+    # The format goes first: drivers validate the size and rate against it
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode["fourcc"]))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode["width"])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode["height"])
+    cap.set(cv2.CAP_PROP_FPS, mode["fps"])
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, mode.get("buffer_size", 1))
+    return current_mode(cap)
+
+
+def measure(cap, frames=30, warmup=3, stall=0.25):
+    """
+    Delivered frame rate and jitter over frames reads, and how many frames the
+    driver has queued after the reader stalls for stall seconds. Queued frames
+    come back immediately and are up to queue_latency_ms old.
+    """
+    frame = None
+    for _ in range(warmup):
+        ret, frame = cap.read(frame)
+    stamps = []
+    for _ in range(frames):
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        stamps.append(time.perf_counter())
+    if len(stamps) < 2:
+        return {"measured_fps": 0.0, "jitter_ms": 0.0, "queued_frames": 0, "queue_latency_ms": 0.0}
+
+    intervals = np.diff(stamps)
+    interval = (stamps[-1] - stamps[0]) / (len(stamps) - 1)
+    time.sleep(stall)
+    queued = 0
+    for _ in range(16):
+        start = time.perf_counter()
+        ret, frame = cap.read(frame)
+        if not ret or time.perf_counter() - start > interval / 2:
+            break
+        queued += 1
+    return {
+        "measured_fps": 1 / interval,
+        "jitter_ms": float(intervals.std() * 1000),
+        "queued_frames": queued,
+        "queue_latency_ms": queued * interval * 1000,
+    }
+
+
+def negotiate(cap, min_size=(640, 360), fps=30, fourccs=FOURCCS, resolutions=RESOLUTIONS, frames=20, log=print):
+    """
+    Try the candidate modes, compressed formats and small sizes first, and
+    settle on the first one at least min_size that delivers close to fps with a
+    one-frame driver buffer. If none does, the fastest (then smallest) mode
+    wins. Returns (chosen mode, every mode measured).
+    """
+    measured, tried = [], set()
+    for fourcc in fourccs:
+        for width, height in resolutions:
+            if width < min_size[0] or height < min_size[1]:
+                continue
+            mode = apply_mode(cap, {"fourcc": fourcc, "width": width, "height": height, "fps": fps, "buffer_size": 1})
+            key = (mode["fourcc"], mode["width"], mode["height"])
+            # Drivers snap unsupported requests to a nearby mode, which may already have been measured
+            if mode["width"] < min_size[0] or mode["height"] < min_size[1] or key in tried:
+                continue
+            tried.add(key)
+            mode.update(measure(cap, frames))
+            measured.append(mode)
+            log(f"Camera: {mode['fourcc']} {mode['width']}x{mode['height']} {mode['measured_fps']:.1f} fps, "
+                f"{mode['queued_frames']} queued")
+            if mode["measured_fps"] >= fps * 0.9:
+                return mode, measured
+
+    if not measured:
+        # Nothing reaches min_size: keep whatever the device runs at
+        mode = current_mode(cap)
+        mode.update(measure(cap, frames))
+        return mode, [mode]
+    best = max(measured, key=lambda m: (round(m["measured_fps"]), -m["width"] * m["height"]))
+    apply_mode(cap, best)
+    return best, measured
+
+
+class CameraProfiles:
+    """Negotiated capture modes per device, saved as JSON so later starts skip the probing."""
+
+    def __init__(self, path=PROFILE_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.profiles = json.load(f)
+        except (OSError, ValueError):
+            self.profiles = {}
+
+    def get(self, device):
+        return self.profiles.get(device)
+
+    def put(self, device, profile):
+        self.profiles[device] = profile
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self.profiles, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Could not save camera profile: {e}")
+
+
+def configure(cap, device, profiles=None, min_size=(640, 360), fps=30, reprobe=False, log=print):
+    """
+    Put cap in the low-latency mode saved for device, or negotiate one and save
+    it. The saved mode is only reused if the driver still accepts it and the
+    requirements are the same. Returns the profile.
+    """
+    profiles = profiles or CameraProfiles()
+    needs = {"min_size": list(min_size), "target_fps": fps}
+    profile = None if reprobe else profiles.get(device)
+    if profile is not None and profile.get("needs") == needs:
+        mode = apply_mode(cap, profile)
+        if all(mode[key] == profile[key] for key in ("fourcc", "width", "height")):
+            log(f"Camera: using saved {mode['fourcc']} {mode['width']}x{mode['height']} profile for {device}")
+            return profile
+
+    start = time.perf_counter()
+    default = current_mode(cap)
+    default.update(measure(cap, frames=10))
+    profile, _ = negotiate(cap, min_size, fps, log=log)
+    profile.update(needs=needs, default=default, probe_seconds=time.perf_counter() - start)
+    profiles.put(device, profile)
+    log(f"Camera: chose {profile['fourcc']} {profile['width']}x{profile['height']} at {profile['measured_fps']:.1f} fps "
+        f"(was {default['fourcc']} {default['width']}x{default['height']} at {default['measured_fps']:.1f} fps, "
+        f"{default['queued_frames']} queued) for {device}")
+    return profile
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Negotiate and save a low-latency capture mode for a camera.")
+    parser.add_argument("--device", type=int, default=0)
+    parser.add_argument("--simulate", action="store_true", help="Probe a simulated webcam instead")
+    parser.add_argument("--min-width", type=int, default=640)
+    parser.add_argument("--min-height", type=int, default=360)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--profiles", default=PROFILE_PATH, help="JSON file the chosen profiles are saved in")
+    args = parser.parse_args(argv)
+
+    cap = SimulatedCamera() if args.simulate else cv2.VideoCapture(args.device)
+    if not cap.isOpened():
+        print(f"Could not open camera {args.device}.")
+        return 1
+    device = device_key("simulated" if args.simulate else args.device, cap)
+    profile = configure(cap, device, CameraProfiles(args.profiles), (args.min_width, args.min_height), args.fps,
+                        reprobe=True)
+    cap.release()
+    print(json.dumps({device: profile}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
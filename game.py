@@ -0,0 +1,133 @@
+import numpy as np
+import utils
+from bots import UniformBot
+
+COUNTDOWN_WORDS = ("Rock", "Paper", "Scissors")
+
+
+class GameSession:
+    """
+    The round logic of game_screen as a tickable state machine, without pygame,
+    the camera or MQTT, so it can run headless or many times in one process.
+
+    Every tick takes the gesture seen for each player slot this frame (or the
+    hands found in it, with tick_landmarks) and returns a list of event dicts:
+    headline changes, the round result, the explicit easter egg and restarts.
+    Time is whatever clock the caller passes as now (seconds).
+
+    With one player the opponent is the bot (a bots.Bot, uniformly random by
+    default), which observes the player's move after every round; with two
+    players the opponent is player 2's locked gesture.
+    """
+
+    def __init__(self, players=1, countdown=3.0, limit=5, bot=None, explicit_interval=1.3, now=0.0):
+        self.players = players
+        self.countdown = countdown
+        self.bot = bot or UniformBot()
+        self.observed = np.zeros(1, dtype=np.int64)
+        self.explicit_interval = explicit_interval
+        self.stabilizers = [utils.GestureStabilizer(limit=limit) for _ in range(players)]
+        self.tracker = utils.PlayerTracker(players)
+        self.hand_filter = utils.HandFilter(players)
+        self.scores = [0, 0]
+        self.rounds = 0
+        self.slots = [-1] * players
+        self.last_explicit = now
+        self.restart(now)
+
+    def restart(self, now):
+        """Start a new round (scores are kept)."""
+        self.start_time = now
+        self.player_choice, self.opponent_choice = None, None
+        self.winner = None
+        self.result_run_start = None  # When the gesture behind the result started being held
+        self.locked = [False] * self.players
+        self.headline = None
+        for stabilizer in self.stabilizers:
+            stabilizer.reset()
+
+    @property
+    def phase(self):
+        if self.headline in COUNTDOWN_WORDS:
+            return "countdown"
+        return "result" if self.winner else "shoot"
+
+    def tick_landmarks(self, landmarks, now, handedness=(), width=1):
+        """Assign the hands of one detection pass to slots, smooth and classify them in one batch and tick."""
+        self.slots = self.tracker.assign(landmarks, handedness, width)
+        return self.tick(self.hand_filter.update(landmarks, self.slots, now), now)
+
+    def tick(self, gestures, now):
+        """Advance one frame with the gesture seen for every slot ("Unknown" if none)."""
+        events = []
+        self.locked = [stabilizer.update(gesture, now) for stabilizer, gesture in zip(self.stabilizers, gestures)]
+
+        elapsed = now - self.start_time
+        if elapsed < self.countdown:
+            headline = COUNTDOWN_WORDS[min(int(elapsed * 3 / self.countdown), 2)]
+        else:
+            # Bot's choice, or player 2's locked gesture
+            if self.players == 1:
+                if not self.opponent_choice:
+                    self.opponent_choice = self.bot.move()
+            elif self.opponent_choice not in utils.MOVES:
+                self.opponent_choice = self.locked[1]
+
+            # Player's choice
+            if self.player_choice not in utils.MOVES:
+                self.player_choice = self.locked[0]
+
+            if self.player_choice in utils.MOVES and self.opponent_choice in utils.MOVES:
+                headline = "VS"
+                if not self.winner:
+                    self.winner = utils.check_winner(self.player_choice, self.opponent_choice)
+                    if self.winner == "Player":
+                        self.scores[0] += 1
+                    elif self.winner == "Bot":
+                        self.scores[1] += 1
+                    self.rounds += 1
+                    if self.players == 1:
+                        self.observed[0] = utils.MOVE_INDEX[self.player_choice]
+                        self.bot.observe(self.observed)
+                    self.result_run_start = max(stabilizer.run_start for stabilizer in self.stabilizers)
+                    # How long after "Shoot!" the gestures behind the result locked
+                    time_to_lock = max(0.0, now - self.start_time - self.countdown)
+                    events.append({"type": "result", "winner": self.winner, "choices": [self.player_choice, self.opponent_choice],
+                                   "scores": list(self.scores), "time_to_lock": time_to_lock})
+            else:
+                headline = "Shoot!"
+
+        if headline != self.headline:
+            self.headline = headline
+            events.append({"type": "headline", "text": headline})
+
+        # Easter egg, rate limited across all slots
+        explicit = [slot for slot, gesture in enumerate(self.locked) if gesture == "Explicit"]
+        if explicit and now - self.last_explicit > self.explicit_interval:
+            self.last_explicit = now
+            events.append({"type": "explicit", "slots": explicit})
+
+        # Restart the round if a player makes a rock-on gesture
+        if "Restart" in self.locked:
+            self.restart(now)
+            events.append({"type": "restart"})
+        return events
+
+    def state(self):
+        return {
+            "phase": self.phase, "headline": self.headline, "scores": list(self.scores), "rounds": self.rounds,
+            "choices": [self.player_choice or None, self.opponent_choice or None], "winner": self.winner,
+            "locked": [gesture or None for gesture in self.locked],
+        }
+
+
+def replay(gestures, players=1, fps=30.0, **kwargs):
+    """Run a session over per-frame gestures (a name, or one per slot) at a fixed frame rate and return its events."""
+    session = GameSession(players, **kwargs)
+    events = []
+    for frame, slot_gestures in enumerate(gestures):
+        if isinstance(slot_gestures, str):
+            slot_gestures = [slot_gestures]
+        for event in session.tick(slot_gestures, frame / fps):
+            events.append((frame, event))
+    return session, events
@@ -1,7 +1,22 @@
-import paho.mqtt.client as mqtt_client
+import time
+STARTED = time.perf_counter()  # Start of the process as far as the startup log is concerned
+
 import pygame as pg
 import numpy as np
-import cv2, time, utils
+import cv2, os, utils
+from camera import CameraStream, VideoFileSource, SimulatedCamera, configure, device_key
+from publisher import MqttPublisher
+from render import TextRenderer, PreviewCompositor, DirtyCompositor, OverlayCompositor, Overlay, SurfaceGrabber
+from assets import AssetManager
+from inference_worker import InferenceWorker
+from scheduler import FrameScheduler
+from profiler import Profiler
+from recording import ReplaySource
+from game import GameSession
+from bots import BOTS, make_bot
+from startup import Startup
+from store import ScoreStore
+from spectator import SpectatorServer
 
 # MQTT settings
 broker = '150.140.186.118'
@@ -9,29 +24,48 @@ port = 1883
 topic = "hci_2024"  
 client_id = 'rand_id' + str(np.random.randint(0,1000))
 
+# Shared font and rendered text cache
+text_renderer = TextRenderer('font.ttf')
 
-def connect_mqtt():
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            print("Connected to MQTT Broker!")
-        else:
-            print(f"Failed to connect, return code {rc}\n")
+# Camera preview drawn into one reused Surface (mirrored for a selfie view)
+preview = PreviewCompositor((320, 250))
+
+# Failed camera reads in a row (each waits up to a second) before the camera is reopened
+CAMERA_REOPEN_AFTER = 3
+
+# Long side in pixels of the frame the detector searches for new hands
+SEARCH_SIZE = 640
+
+# Sprites alpha-blended into the camera frame, anchored to hand landmarks.
+# The explicit label covers the middle finger (centred on its middle joint)
+overlays = OverlayCompositor()
+EXPLICIT_OVERLAYS = [Overlay("explicit", anchor=11, size_from=(9, 12))]
+
+# Target FPS per screen; None means idle mode (redraw only on input)
+scheduler = FrameScheduler({"home": 30, "popup": None, "game": 60})
+
+# Per-stage timers; enable with RPS_PROFILE=1 or F2 in game, export with RPS_PROFILE_EXPORT=path.json|.csv
+profiler = Profiler(enabled=bool(os.environ.get("RPS_PROFILE")), export_path=os.environ.get("RPS_PROFILE_EXPORT"))
+
+# Background start-up tasks (camera, assets, detector), set up in __main__
+startup = None
+
+# Round history and leaderboards (RPS_SCORES=path, scores.db by default), set up in __main__
+scores = None
+
+# Local spectator stream of the game view and state (RPS_SPECTATOR_PORT, 0 turns it off), set up in __main__
+spectators = None
+spectator_view = SurfaceGrabber((640, 360))
+
+# Strategy of the single-player bot (RPS_BOT, one of bots.BOTS), checked in __main__
+bot_name = "uniform"
 
-    client = mqtt_client.Client(client_id)
-    # client.username_pw_set(username, password)  # Uncomment if username/password is required
-    client.on_connect = on_connect
-    client.connect(broker, port)
-    return client
 
 def mqtt_publish(values, message):
-    try:
-        client = connect_mqtt()
-        out = ",".join([str(x) for x in values])
-        out += f",{message}"
-        client.publish(topic, out)
-    except:
-        print("Mqtt error: Could not publish message.")
-        return
+    """Queue a message on the shared publisher; never blocks the frame loop."""
+    t = profiler.start()
+    publisher.publish(values, message)
+    profiler.stop("mqtt", t)
 
 class GUI:
     def __init__(self, width, height, title):
@@ -39,15 +73,20 @@ class GUI:
         self.width = width
         self.height = height
         self.title = title
-        self.screen = pg.display.set_mode((width, height))
+        # Screens of the same size share the one window instead of recreating it
+        screen = pg.display.get_surface()
+        if screen is not None and screen.get_size() == (width, height):
+            self.screen = screen
+        else:
+            self.screen = pg.display.set_mode((width, height))
         pg.display.set_caption(title)
         self.clock = pg.time.Clock()
+        self.preview = None
 
     def draw(self, img):
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = np.rot90(img)
-        img = pg.surfarray.make_surface(img)
-        self.screen.blit(img, (0, 0))
+        if self.preview is None or self.preview.size != (img.shape[1], img.shape[0]):
+            self.preview = PreviewCompositor((img.shape[1], img.shape[0]))
+        self.screen.blit(self.preview.update(img), (0, 0))
         pg.display.flip()
         self.clock.tick(60)
 
@@ -76,64 +115,94 @@ class Button:
 
 
 class Animation:
-    def __init__(self, x, y, image, screen):
-        self.image = image
-        self.original_image = image  # Save the original image for resizing
+    def __init__(self, x, y, assets, name, screen):
+        self.assets = assets
+        self.name = name
+        self.image = assets[name]
         self.rect = self.image.get_rect()
         self.rect.topleft = (x, y)
         self.screen = screen
         self.scale_factor = 0.8  # Initial scale factor (normal size)
         self.enlarging = True  # Flag to track whether the image is enlarging or shrinking
+        self.speed = 0.06  # Scale change per second when updated with the frame time
 
-    def draw(self):
+    def draw(self, compositor=None):
         """Draw the animation (image) to the screen with current scaling."""
-        # Scale the image based on the scale factor
-        scaled_image = pg.transform.scale(self.original_image, 
-                                          (int(self.original_image.get_width() * self.scale_factor), 
-                                           int(self.original_image.get_height() * self.scale_factor)))
+        # Scale the image based on the scale factor (cached per quantized step)
+        scaled_image = self.assets.scaled(self.name, self.scale_factor)
         # Get the new rectangle for the scaled image
         new_rect = scaled_image.get_rect()
         new_rect.center = self.rect.center  # Set the center of the scaled image to the original center
-        self.screen.blit(scaled_image, new_rect.topleft)
+        if compositor is None:
+            self.screen.blit(scaled_image, new_rect.topleft)
+        else:
+            compositor.draw(self.name, scaled_image, new_rect.topleft)
 
-    def update(self):
-        """Update the scale factor for enlarging and shrinking."""
+    def update(self, dt=None):
+        """Update the scale factor for enlarging and shrinking, by frame time dt if given."""
+        step = 0.0003 if dt is None else self.speed * dt
         if self.enlarging:
-            self.scale_factor += 0.0003  # Increase scale slowly
+            self.scale_factor += step  # Increase scale slowly
             if self.scale_factor >= 0.85:  
                 self.enlarging = False
         else:
-            self.scale_factor -= 0.0003  # Decrease scale slowly
+            self.scale_factor -= step  # Decrease scale slowly
             if self.scale_factor <= 0.75:  # When the image reaches its original size, start enlarging
                 self.enlarging = True
 
 
+# Images the home screen needs for its first frame; the rest are decoded in the background
+HOME_ASSETS = ("home_screen", "animated_image", "start_button_image", "exit_button_image",
+               "question_button_image", "qr_button_image")
+
+
 def load_images():
-    return {
-        "home_screen": pg.image.load("images/bg.jpg"),
-        "animated_image": pg.image.load('images/hands.png'),
-        "start_button_image": pg.image.load('images/start_btn.jpg'),
-        "exit_button_image": pg.image.load('images/exit_btn.jpg'),
-        "question_button_image": pg.transform.scale(pg.image.load('images/question.png'), (100, 120)),
-        "qr_button_image": pg.transform.scale(pg.image.load('images/qr.png'), (100, 100)),
-        "qr_code_image": pg.transform.scale(pg.image.load("images/scan.png"), (300, 300)),
-        "rock": pg.image.load("images/rock.png"),
-        "rock_lose": pg.image.load("images/rock_lose.png"),
-        "rock_win": pg.image.load("images/rock_win.png"),
-        "paper": pg.image.load("images/paper.png"),
-        "paper_lose": pg.image.load("images/paper_lose.png"),
-        "paper_win": pg.image.load("images/paper_win.png"),
-        "scissors": pg.image.load("images/scissors.png"),
-        "scissors_lose": pg.image.load("images/scissors_lose.png"),
-        "scissors_win": pg.image.load("images/scissors_win.png")
-    }
-
-def open_camera():
+    """Image specs for every screen. Call .load() (needs the display) or .decode() to read them."""
+    return AssetManager({
+        "home_screen": ("images/bg.jpg", None),
+        "animated_image": ('images/hands.png', None),
+        "start_button_image": ('images/start_btn.jpg', None),
+        "exit_button_image": ('images/exit_btn.jpg', None),
+        "question_button_image": ('images/question.png', (100, 120)),
+        "qr_button_image": ('images/qr.png', (100, 100)),
+        "qr_code_image": ("images/scan.png", (300, 300)),
+        "rock": ("images/rock.png", None),
+        "rock_lose": ("images/rock_lose.png", None),
+        "rock_win": ("images/rock_win.png", None),
+        "paper": ("images/paper.png", None),
+        "paper_lose": ("images/paper_lose.png", None),
+        "paper_win": ("images/paper_win.png", None),
+        "scissors": ("images/scissors.png", None),
+        "scissors_lose": ("images/scissors_lose.png", None),
+        "scissors_win": ("images/scissors_win.png", None)
+    }, array_specs={
+        "explicit": ("images/explicit.png", cv2.IMREAD_UNCHANGED)
+    })
+
+def open_camera(source=0):
+    """
+    Open the camera (a video file, or "simulated" for a simulated webcam) and
+    start reading it on a background thread. Cameras are put in the low-latency
+    mode negotiated for them, probing it on first use (RPS_CAMERA_REPROBE=1
+    probes again).
+    """
     print("Opening camera...")
-    cap = cv2.VideoCapture(0)
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if source == "simulated":
+        cap = SimulatedCamera()
+    elif isinstance(source, str):
+        cap = VideoFileSource(source)
+    else:
+        cap = cv2.VideoCapture(source)
     if cap.isOpened():
+        if not isinstance(cap, VideoFileSource):
+            # The detector needs no more than 640x360: it searches the frame downscaled to SEARCH_SIZE
+            # px on the long side and tracks a 256 px crop
+            configure(cap, device_key(source, cap), min_size=(SEARCH_SIZE, SEARCH_SIZE * 9 // 16), fps=30,
+                      reprobe=bool(os.environ.get("RPS_CAMERA_REPROBE")))
         print("Camera opened successfully.")
-        return cap
+        return CameraStream(cap).start()
     
     print("Error: Could not open camera.")
     return
@@ -179,7 +248,9 @@ def show_qr_popup(gui):
     # Handle events for closing the pop-up
     pop_up_running = True
     while pop_up_running:
-        for event in pg.event.get():
+        # The pop-up is static, so the scheduler idles until there is input
+        events = scheduler.frame("popup")
+        for event in events:
             if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                 # Close the popup if the close button is clicked
                 if close_button_x <= event.pos[0] <= close_button_x + 20 and \
@@ -189,9 +260,10 @@ def show_qr_popup(gui):
                 pop_up_running = False
 
         # Ensure the popup and button remain visible
-        gui.screen.blit(popup_surface, (popup_x, popup_y))
-        draw_close_button()
-        pg.display.update()
+        if events:
+            gui.screen.blit(popup_surface, (popup_x, popup_y))
+            draw_close_button()
+            pg.display.update()
 
     # Close the popup and return to the home screen
     pg.display.update()
@@ -210,7 +282,6 @@ def show_instructions_popup(gui):
     pg.draw.rect(popup_surface, (50, 100, 200), (0, 0, popup_width, popup_height), width=4, border_radius=20)  # Blue border
 
     # Add instructions text
-    font = pg.font.Font('font.ttf', 30)
     instructions_text = [
         "FOLLOWING THE RULES IS PART OF ANY GAME!",
         " ",
@@ -226,7 +297,7 @@ def show_instructions_popup(gui):
     # Display the text centered inside the pop-up
     y_offset = 30
     for line in instructions_text:
-        text_surface = font.render(line, True, (30, 30, 80))  # Dark blue text
+        text_surface = text_renderer.render(line, 30, (30, 30, 80))  # Dark blue text
         text_rect = text_surface.get_rect(center=(popup_width // 2, y_offset))
         popup_surface.blit(text_surface, text_rect.topleft)
         y_offset += 40  # Move down for the next line
@@ -252,7 +323,9 @@ def show_instructions_popup(gui):
     # Handle events for closing the pop-up
     pop_up_running = True
     while pop_up_running:
-        for event in pg.event.get():
+        # The pop-up is static, so the scheduler idles until there is input
+        events = scheduler.frame("popup")
+        for event in events:
             if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                 # Close the popup if the close button is clicked
                 if close_button_x <= event.pos[0] <= close_button_x + 20 and \
@@ -262,35 +335,63 @@ def show_instructions_popup(gui):
                 pop_up_running = False
 
         # Ensure the popup and button remain visible
-        gui.screen.blit(popup_surface, (popup_x, popup_y))
-        draw_close_button()
-        pg.display.update()
+        if events:
+            gui.screen.blit(popup_surface, (popup_x, popup_y))
+            draw_close_button()
+            pg.display.update()
 
     # Close the popup and return to the home screen
     pg.display.update()
 
 
-def draw_text(gui, text, pos, font_size):
-    font = pg.font.Font('font.ttf', font_size)
-    text = pg.font.Font.render(font, text, True, (168, 83, 76))
-    gui.screen.blit(text, (int(pos[0]) - text.get_width() // 2, int(pos[1])))
-    
-def draw_camera_feed(gui, frame):
-    # Resize and draw the camera feed
-    frame = cv2.resize(frame, (320, 250))
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame = np.rot90(frame)
-    camera_surface = pg.surfarray.make_surface(frame)
+def text_surface(text, pos, font_size):
+    """Rendered text and its top-left position, centred horizontally on pos."""
+    text = text_renderer.render(text, font_size, (168, 83, 76))
+    return text, (int(pos[0]) - text.get_width() // 2, int(pos[1]))
+
+def draw_text(gui, text, pos, font_size, compositor=None, key=None):
+    surface, topleft = text_surface(text, pos, font_size)
+    if compositor is None:
+        gui.screen.blit(surface, topleft)
+    else:
+        compositor.draw(key or text, surface, topleft)
+
+def camera_feed_rect(gui):
+    camera_x = (gui.width - preview.size[0]) // 2  # Center horizontally
+    camera_y = gui.height - preview.size[1] - 50  # Offset from the bottom
+    return pg.Rect(camera_x, camera_y, preview.size[0], preview.size[1])
 
-    camera_x = (gui.width - camera_surface.get_width()) // 2  # Center horizontally
-    camera_y = gui.height - camera_surface.get_height() - 50  # Offset from the bottom
+def draw_camera_feed(gui, frame, compositor=None):
+    # Resize, mirror and draw the camera feed through the shared preview buffer
+    camera_surface = preview.update(frame)
+    camera_rect = camera_feed_rect(gui)
+
+    if compositor is not None:
+        # The border is a static layer; the feed changes every frame
+        compositor.draw("camera", camera_surface, camera_rect.topleft, changed=True)
+        return
 
     # Draw border around the camera feed
-    border_rect = pg.Rect(camera_x - 5, camera_y - 5, camera_surface.get_width() + 10, camera_surface.get_height() + 10)
-    pg.draw.rect(gui.screen, (255, 255, 255), border_rect)
+    pg.draw.rect(gui.screen, (255, 255, 255), camera_rect.inflate(10, 10))
 
     # Draw the camera feed
-    gui.screen.blit(camera_surface, (camera_x, camera_y))
+    gui.screen.blit(camera_surface, camera_rect.topleft)
+
+
+def start_game(gui, players=1):
+    """Run the game once the camera, images and detector are ready, showing a warm-up message until then."""
+    global cap
+    if startup is not None:
+        compositor = DirtyCompositor(gui.screen, images["home_screen"])
+        while not startup.ready():
+            for event in scheduler.frame("home"):
+                if event.type == pg.QUIT:
+                    return
+            draw_text(gui, text="Getting ready...", pos=(gui.width//2, gui.height//2), font_size=100, compositor=compositor, key="headline")
+            compositor.present()
+        if "camera" in startup.tasks:
+            cap = startup.result("camera")
+    game_screen(gui, players)
 
 
 def home_screen(gui):
@@ -304,19 +405,25 @@ def home_screen(gui):
     qr_btn = Button(50 , 620, images["qr_button_image"], gui.screen)
     
     # Create an animated image to display on the home screen 
-    animation = Animation(640 - images["animated_image"].get_width() // 2, 150, images["animated_image"], gui.screen)  # Position above the buttons
+    animation = Animation(640 - images["animated_image"].get_width() // 2, 150, images, "animated_image", gui.screen)  # Position above the buttons
+
+    # Background, title and buttons never change, so they are composed once
+    compositor = DirtyCompositor(gui.screen, images["home_screen"])
+    compositor.add_static(*text_surface("Rock-Paper-Scissors Shoot!", (gui.width // 2, 50), 100))
+    for button in (start_btn, exit_btn, question_btn, qr_btn):
+        compositor.add_static(button.image, button.rect.topleft)
 
     while True:
         mouse_pos = pg.mouse.get_pos()
 
-        for event in pg.event.get():
+        for event in scheduler.frame("home"):
             if event.type == pg.QUIT:
                 return
             
             if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                 # Start game
                 if start_btn.is_hovered(mouse_pos):
-                    game_screen(gameplay_gui)
+                    start_game(gameplay_gui)
                     return
                 # Exit
                 elif exit_btn.is_hovered(mouse_pos):
@@ -325,189 +432,247 @@ def home_screen(gui):
                 # Instructions
                 elif question_btn.is_hovered(mouse_pos):
                     show_instructions_popup(gui)
+                    compositor.invalidate()
                 # QR code
                 elif qr_btn.is_hovered(mouse_pos):
                     show_qr_popup(gui)
+                    compositor.invalidate()
+
+            # F3 toggles the redrawn-regions debug overlay
+            if event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                compositor.debug = not compositor.debug
+            # Press '2' to start a local two-player game
+            elif event.type == pg.KEYDOWN and event.key == pg.K_2:
+                start_game(gameplay_gui, players=2)
+                return
                     
             if start_btn.is_hovered(mouse_pos) or exit_btn.is_hovered(mouse_pos) or question_btn.is_hovered(mouse_pos) or qr_btn.is_hovered(mouse_pos):
                 pg.mouse.set_cursor(pg.SYSTEM_CURSOR_HAND)
             else:
                 pg.mouse.set_cursor(pg.SYSTEM_CURSOR_ARROW)
 
-        # Draw home screen components
-        gui.screen.blit(images["home_screen"], (0, 0))
-        draw_text(gui, text="Rock-Paper-Scissors Shoot!", pos=(gui.width // 2, 50), font_size=100)
-
-        start_btn.draw()
-        exit_btn.draw()
-        question_btn.draw()
-        qr_btn.draw()
-        
-        animation.update()
-        animation.draw()
+        # Draw home screen components (only the animation is dynamic)
+        animation.update(scheduler.dt)
+        animation.draw(compositor)
         
-        # Update the display
-        pg.display.update()
+        # Update the changed regions of the display
+        compositor.present()
+        if startup is not None:
+            startup.mark("first_frame")
 
-def game_screen(gui):
+def game_screen(gui, players=1):
     """
     Game screen to show webcam feed during the game.
+    The round logic lives in game.GameSession; this loop feeds it the landmarks
+    of each frame and draws its state. With two players, player 2 takes the
+    place of the bot.
     """
+    global cap
     pg.mouse.set_cursor(pg.SYSTEM_CURSOR_ARROW)
 
-    past_gestures, counter = [], 0
-    start_time, last_explicit_time = time.time(), time.time()
-    player_choice, bot_choice = None, None
-    player_score, bot_score = 0, 0
-    added_scores = False
+    if "explicit" not in overlays:
+        overlays.add_sprite("explicit", images.array("explicit"))
+
+    session = GameSession(players, bot=make_bot(bot_name), now=time.perf_counter())
+    score_session = scores.start_session(players, bot_name if players == 1 else None) if scores is not None else None
+    score_labels = ("Player's score", "Bot's score") if players == 1 else ("Player 1's score", "Player 2's score")
+    frame_index = 0
+    camera_failures = 0
+
+    # Static layers: background and camera border, plus the result sprites once shown
+    compositor = DirtyCompositor(gui.screen)
+    def reset_static_layers():
+        compositor.set_background(images["home_screen"])
+        compositor.add_static_rect((255, 255, 255), camera_feed_rect(gui).inflate(10, 10))
+    reset_static_layers()
+
+    def leave():
+        if scores is not None:
+            scores.end_session(score_session)
+        gameplay_gui.close()
+        cap.release()
 
     while True:
+        frame_start = t = profiler.start()
         ret, img = cap.read()
+        frame_index += 1
+        profiler.stop("capture", t)
 
         if not ret:
+            # No frame within the read timeout: keep the window responsive and reopen the camera if it stays lost
+            camera_failures += 1
             print("Error: Failed to capture video.")
-
-        img = cv2.flip(img, 1)  # Reverse the image horizontally
-        
-        img = utils.detector.find_hands(img)
-        landmarks = utils.detector.find_position(img)
-
-        for event in pg.event.get():
-            if event.type == pg.QUIT:  # Quit event
-                gameplay_gui.close()
+            draw_text(gui, text="Camera lost...", pos=(gui.width//2, gui.height//2-100), font_size=100, compositor=compositor, key="headline")
+            compositor.present()
+            for event in scheduler.frame("game"):
+                if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_q):
+                    leave()
+                    return
+            if camera_failures % CAMERA_REOPEN_AFTER == 0 and isinstance(cap, CameraStream):
                 cap.release()
+                cap = open_camera(os.environ.get("RPS_CAMERA", 0)) or cap
+            continue
+        camera_failures = 0
+
+        # Detection runs on the unflipped frame in the inference worker; the finger
+        # angles do not change under mirroring and the preview mirrors for display.
+        # During the countdown no gesture is needed, so only every third frame is sent.
+        # While a player slot has no hand the whole frame is searched, so a player who walks in is found at once
+        t = profiler.start()
+        if session.phase != "countdown" or frame_index % 3 == 0:
+            inference.submit(img, search=session.tracker.has_empty_slot())
+        # Render with the latest landmarks available instead of waiting for this frame's
+        last_result = inference.result_id
+        landmarks = inference.poll()
+        if inference.result_id != last_result:
+            profiler.record("find_hands", inference.inference_time)
+        utils.draw_landmarks(img, landmarks)
+        profiler.stop("inference", t)
+
+        for event in scheduler.frame("game"):
+            if event.type == pg.QUIT:  # Quit event
+                leave()
                 return
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_q:  # Press 'Q' to quit
-                    gameplay_gui.close()
-                    cap.release()
+                    leave()
                     return
-        
-        # Capture the hand landmarks and check for gestures
-        if len(landmarks) != 0:
-            counter += 1
-            finger_pos = utils.finger_combo(landmarks)
-            past_gestures.append(finger_pos)
-        else:
-            past_gestures.append("Unknown")
-        
-        # Draw the background
-        gui.screen.blit(images["home_screen"], [0, 0])
-        
-        # Draw the player's and bot's scores
-        draw_text(gui, text=f"Player's score:   {player_score}", pos=(gui.width//2 + 300, 50), font_size=50)
-        draw_text(gui, text=f"Bot's score:   {bot_score}", pos=(gui.width//2 - 400, 50), font_size=50)
+                elif event.key == pg.K_F3:  # Toggle the redrawn-regions debug overlay
+                    compositor.debug = not compositor.debug
+                elif event.key == pg.K_F2:  # Toggle the profiler and its overlay
+                    profiler.enabled = not profiler.enabled
+
+        # Capture the hand landmarks, check for gestures and advance the round
+        t = profiler.start()
+        now = time.perf_counter()
+        events = session.tick_landmarks(landmarks, now, inference.handedness, img.shape[1])
+        profiler.stop("finger_combo", t)
+
+        # Draw the player's and bot's scores and the headline
+        t = profiler.start()
+        draw_text(gui, text=f"{score_labels[0]}:   {session.scores[0]}", pos=(gui.width//2 + 300, 50), font_size=50, compositor=compositor, key="player_score")
+        draw_text(gui, text=f"{score_labels[1]}:   {session.scores[1]}", pos=(gui.width//2 - 400, 50), font_size=50, compositor=compositor, key="bot_score")
+        draw_text(gui, text=session.headline, pos=(gui.width//2, gui.height//2-100), font_size=100, compositor=compositor, key="headline")
+
+        for event in events:
+            if event["type"] == "result":
+                # Only queued here; the store writes in batches on its own thread
+                if scores is not None:
+                    scores.record_round(score_session, event)
+
+                # Publish the vibration message
+                winner = event["winner"]
+                if winner == "Player":
+                    mqtt_publish([1001], "win")
+                elif winner == "Bot":
+                    mqtt_publish([1001, 500, 1001], "lose")
+                else:
+                    mqtt_publish([2000], "draw")
 
-        current_time = time.time()
-        
-        # Countdown before the game starts (Rock, Paper, Scissors)
-        if current_time - start_time < 1:
-            draw_text(gui, text="Rock", pos=(gui.width//2, gui.height//2-100), font_size=100)
-        elif current_time - start_time < 2:
-            draw_text(gui, text="Paper", pos=(gui.width//2, gui.height//2-100), font_size=100)
-        elif current_time - start_time < 3:
-            draw_text(gui, text="Scissors", pos=(gui.width//2, gui.height//2-100), font_size=100)
-        # Game has started
-        else:
-            # Bot's choice
-            if not bot_choice:
-                bot_choice = utils.bot_choice()
-
-            # Player's choice
-            if not player_choice or player_choice == "Unknown" or player_choice == "Explicit":
-                player_choice = utils.check_locked_gesture(past_gestures, limit=5)
-                draw_text(gui, text="Shoot!", pos=(gui.width//2, gui.height//2-100), font_size=100)
-
-            if player_choice and player_choice != "Restart" and player_choice != "Unknown" and player_choice != "Explicit":
-                draw_text(gui, text = "VS", pos = (gui.width//2, gui.height//2-100), font_size=100)
-                
-                # Check winner
-                winner = utils.check_winner(player_choice, bot_choice)
-
-                # Update scores and publish vibration message
-                if not added_scores:
-                    if winner == "Player":
-                        player_score += 1
-                        mqtt_publish([1001], "win")
-                    elif winner == "Bot":
-                        mqtt_publish([1001, 500, 1001], "lose")
-                        bot_score += 1
-                    else:
-                        mqtt_publish([2000], "draw")
-                    added_scores = True
-                    
-                # Display the choices made by the player and bot
+                # Display the choices made by the player and bot (static until the next round)
+                player_choice, bot_choice = event["choices"]
                 if winner == "Player":
                     bot_choice_image = images[bot_choice+"_lose"]
                     player_choice_image = images[player_choice+"_win"]
-                    gui.screen.blit(bot_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2 -100, 100))
-                    gui.screen.blit(player_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2+700, 100))
                 elif winner == "Bot":
                     bot_choice_image = images[bot_choice+"_win"]
                     player_choice_image = images[player_choice+"_lose"]
-                    gui.screen.blit(bot_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2 -100, 100))
-                    gui.screen.blit(player_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2+700, 100))
                 else:
                     bot_choice_image = images[bot_choice]
                     player_choice_image = images[player_choice]
-                    gui.screen.blit(bot_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2 -100, 100))
-                    gui.screen.blit(player_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2+700, 100))
-
-        # Easter Egg!!
-        if utils.check_locked_gesture(past_gestures, limit=5) == "Explicit":
-
-            explicit = cv2.imread("images/explicit.png")
-            if current_time - last_explicit_time > 1.3:
-                last_explicit_time = current_time
+                compositor.add_static(bot_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2 -100, 100))
+                compositor.add_static(player_choice_image, (gui.width // 4 - bot_choice_image.get_width() // 2+700, 100))
+            elif event["type"] == "explicit":
                 mqtt_publish([1001], "explicit")
+            elif event["type"] == "restart":
+                reset_static_layers()
+        profiler.stop("text", t)
 
-            try:
-                finger_size = np.sqrt((landmarks[12][1]- landmarks[9][1])**2 + (landmarks[12][2]- landmarks[9][2])**2)
-            except IndexError:
-                finger_size = 100
-            
-            scale_factor = explicit.shape[0] / finger_size
-            explicit_size = [int(explicit.shape[1] / scale_factor), int(explicit.shape[0] / scale_factor)]
-            explicit = cv2.resize(explicit, explicit_size)
-
-            try:
-                coords = landmarks[11][1], landmarks[11][2]
-                coords = [int(coords[0] - explicit_size[0]//2), int(coords[1] - explicit_size[1]//2)]
-                x, y = coords[0], coords[1]
-                y_limit_high = min(y+explicit_size[1], img.shape[0])
-                x_limit_high = min(x+explicit_size[0], img.shape[1])
-                y_limit_low = max(y, 0)
-                x_limit_low = max(x, 0)
-                img[y_limit_low:y_limit_high, x_limit_low:x_limit_high] = explicit[:y_limit_high-y_limit_low, :x_limit_high-x_limit_low]
-            except:
-                pass
-        
-        # Restart the game if the player makes a rock-on gesture
-        if utils.check_locked_gesture(past_gestures, limit=5) == "Restart":
-            bot_choice = None
-            player_choice = None
-            added_scores = False
-            start_time = current_time
-            past_gestures = []
-            counter = 0
-
+        # Easter Egg!!
+        t = profiler.start()
+        for slot, hand in enumerate(session.slots):
+            if session.locked[slot] == "Explicit" and hand >= 0:
+                overlays.draw(img, landmarks[hand], EXPLICIT_OVERLAYS)
+        profiler.stop("overlay", t)
 
         # Display the webcam feed
-        img = cv2.flip(img, 1)  # Reverse the image horizontally
-        draw_camera_feed(gui, img)
+        t = profiler.start()
+        draw_camera_feed(gui, img, compositor)
+        profiler.stop("draw_camera_feed", t)
+
+        if profiler.enabled:
+            compositor.draw("profiler", profiler.overlay(), (10, 110))
         
-        # Update the display
-        pg.display.update()
+        # Update the changed regions of the display
+        t = profiler.start()
+        compositor.present()
+        profiler.stop("present", t)
+
+        # Spectators get the composed view and the state changes; nothing here waits for them
+        if spectators is not None and spectators.running:
+            t = profiler.start()
+            spectators.publish_state(session.state())
+            if spectators.wants_frame():
+                spectators.publish_frame(spectator_view.grab, gui.screen)
+            profiler.stop("spectators", t)
+
+        # End-to-end latency from the gesture being held to its result on screen
+        if any(event["type"] == "result" for event in events):
+            profiler.record("gesture_to_result", time.perf_counter() - session.result_run_start)
+        profiler.stop("frame", frame_start)
+        profiler.maybe_export()
 
 
 if __name__ == "__main__":
-    # Load images and open the camera
-    images = load_images()
-    cap = open_camera()
+    # The home screen comes up first; the camera, the remaining images and the
+    # detector start in the background and the game waits for them if needed
+    startup = Startup(STARTED)
+
+    bot_name = os.environ.get("RPS_BOT", bot_name)
+    if bot_name not in BOTS:
+        print(f"Unknown bot {bot_name!r} in RPS_BOT (choose from {', '.join(BOTS)}), using the uniform bot.")
+        bot_name = "uniform"
 
-    # Create GUI objects for the home and gameplay screens
+    # GUI objects for the home and gameplay screens (they share one window)
     home_gui = GUI(1280, 720, "Rock-Paper-Scissors Shoot!")
     gameplay_gui = GUI(1280, 720, "Rock-Paper-Scissors Shoot!")
 
+    # Only the home screen's images are loaded before the first frame
+    images = load_images().load(HOME_ASSETS)
+    startup.submit("assets", images.decode)
+    scores = ScoreStore(os.environ.get("RPS_SCORES", "scores.db"))
+    startup.submit("scores", scores.start)
+    spectator_port = int(os.environ.get("RPS_SPECTATOR_PORT", 8088))
+    if spectator_port:
+        spectators = SpectatorServer(os.environ.get("RPS_SPECTATOR_HOST", "127.0.0.1"), spectator_port)
+        startup.submit("spectators", spectators.start)
+
+    replay_path = os.environ.get("RPS_REPLAY")
+    if replay_path:
+        # Replay recorded landmarks in place of the camera and the inference worker
+        cap = inference = ReplaySource(replay_path, realtime=not os.environ.get("RPS_REPLAY_FAST"), loop=True)
+    else:
+        cap = None  # Set by start_game once the camera has opened
+        # RPS_CAMERA selects the camera index, a video file or "simulated"
+        startup.submit("camera", open_camera, os.environ.get("RPS_CAMERA", 0))
+
+        # Hand detection runs in its own process, which imports MediaPipe and warms up
+        # its graph now; its frame buffers are allocated with the first submitted frame.
+        # RPS_RECORD=path records the landmarks it finds for later replay
+        # Full-frame searches run at SEARCH_SIZE px on the long side, whatever the capture resolution
+        inference = InferenceWorker(dict(detection_con=0.75, tracking=True, search_size=SEARCH_SIZE, draw=False,
+                                         record=os.environ.get("RPS_RECORD")))
+        startup.submit("detector", inference.wait_ready, 60)
+    startup.seal()
+
+    # Connect to the MQTT broker once and keep the connection for the whole session
+    publisher = MqttPublisher(broker, port, topic, client_id).start()
+
     # Start the game by displaying the home screen
     home_screen(home_gui)
+    startup.shutdown()
+    scores.close()
+    if spectators is not None:
+        spectators.stop()
+    inference.stop()
+    publisher.stop()
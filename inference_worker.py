@@ -0,0 +1,253 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+# Slot states in the shared double buffer
+FREE, WRITING, READY, BUSY = 0, 1, 2, 3
+# Layout of the shared state array: per slot state, frame ID and whether to force a
+# full-frame search, then the generation of the frame buffers currently in use
+STATE_SIZE, GENERATION = 7, 6
+
+
+def _worker_main(setup, state, new_frame, results, stop, warmed_up, detector_kwargs):
+    """Worker process: run HandDetector on frames read straight from shared memory."""
+    import utils
+
+    # Build the detector and run it once before the frame shape is known, so the
+    # MediaPipe import and graph start-up overlap with the camera opening
+    detector = utils.HandDetector(**detector_kwargs)
+    try:
+        detector.hands.process(np.zeros((256, 256, 3), dtype=np.uint8))
+        warmed_up.set()
+        # A new setup message arrives whenever the frame shape changes; _serve returns
+        # once the buffers it uses have been replaced
+        while not stop.is_set():
+            try:
+                shm_name, shape, generation = setup.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if generation == state[GENERATION]:
+                _serve(detector, shm_name, shape, generation, state, new_frame, results, stop)
+    finally:
+        # On shutdown the recording is flushed and closed here, in the process that owns it
+        detector.stop_recording()
+        detector.hands.close()
+
+
+def _serve(detector, shm_name, shape, generation, state, new_frame, results, stop):
+    # Spawned children share the parent's resource tracker, so attaching here does
+    # not change who unlinks the segment
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except FileNotFoundError:
+        return  # Already replaced by newer buffers
+    frames = np.ndarray((2,) + shape, dtype=np.uint8, buffer=shm.buf)
+
+    try:
+        while not stop.is_set():
+            if not new_frame.wait(0.1):
+                continue
+            with state.get_lock():
+                new_frame.clear()
+                if state[GENERATION] != generation:
+                    return
+                ready = [slot for slot in (0, 1) if state[slot] == READY]
+                if stop.is_set() or not ready:
+                    continue
+                slot = max(ready, key=lambda i: state[2 + i])
+                state[slot] = BUSY
+                frame_id, search = state[2 + slot], bool(state[4 + slot])
+
+            detector.find_hands(frames[slot], draw=False, search=search)
+            with state.get_lock():
+                if state[GENERATION] != generation:
+                    return  # The frame was in buffers that have since been replaced
+                state[slot] = FREE
+            results.put((frame_id, detector.landmarks, detector.handedness, detector.inference_time))
+    finally:
+        del frames
+        shm.close()
+
+
+class InferenceWorker:
+    """
+    Runs utils.HandDetector in a separate process so inference does not hold up
+    rendering. Frames are written into a shared memory double buffer (never
+    pickled); landmark results come back on a queue tagged with frame IDs. A
+    worker that dies is restarted on the next poll().
+
+    prepare() launches the worker early so it can import MediaPipe and warm up
+    its graph before the first frame (and its shape) is available. A frame of a
+    new shape (e.g. after the camera was reopened) gets new buffers.
+    """
+
+    def __init__(self, detector_kwargs=None, restart_delay=0.5):
+        self.detector_kwargs = detector_kwargs or {}
+        self.restart_delay = restart_delay
+        self.context = multiprocessing.get_context("spawn")
+        self.shape = None
+        self.shm = None
+        self.frames = None
+        self.process = None
+        self.stop_event = None
+        self.ready = self.context.Event()  # Kept across restarts, so wait_ready() callers see a relaunched worker
+        self.launch_lock = threading.Lock()
+        self.generation = 0
+        self.last_death = 0.0
+
+        self.next_frame_id = 0
+        self.result_id = 0
+        self.landmarks = np.empty((0, 21, 2), dtype=np.float32)
+        self.handedness = []
+        self.inference_time = 0.0
+        self.submitted = 0
+        self.replaced = 0
+        self.restarts = 0
+
+    def prepare(self):
+        """Launch the worker without frame buffers; they are sent over once start() knows the frame shape."""
+        if self.process is None:
+            self._launch()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Block until the worker has built and warmed up its detector, relaunching it if it dies first."""
+        self.prepare()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.ready.wait(0.1):
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            self._restart_if_dead()
+        return True
+
+    def start(self, shape):
+        """Allocate the shared buffers for frames of the given shape and launch the worker if needed."""
+        self.shape = tuple(shape)
+        nbytes = int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(create=True, size=2 * nbytes)
+        self.frames = np.ndarray((2,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.generation += 1
+        if self.process is None:
+            self._launch()
+        else:
+            with self.state.get_lock():
+                self.state[:] = [FREE] * GENERATION + [self.generation]
+            self.setup.put((self.shm.name, self.shape, self.generation))
+            self.new_frame.set()  # Let the worker leave the old buffers
+        return self
+
+    def _release_buffers(self):
+        if self.shm is not None:
+            self.frames = None
+            self.shm.close()
+            self.shm.unlink()  # The worker's own mapping stays valid until it closes it
+            self.shm = None
+
+    def _launch(self):
+        # Fresh synchronisation objects, a crashed worker may have left the old ones locked
+        self.state = self.context.Array("q", STATE_SIZE)
+        self.state[GENERATION] = self.generation
+        self.new_frame = self.context.Event()
+        self.results = self.context.Queue()
+        self.setup = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.ready.clear()
+        if self.shm is not None:
+            self.setup.put((self.shm.name, self.shape, self.generation))
+        self.process = self.context.Process(
+            target=_worker_main, name="hand-inference",
+            args=(self.setup, self.state, self.new_frame, self.results, self.stop_event, self.ready, self.detector_kwargs),
+            daemon=True)
+        self.process.start()
+
+    def submit(self, frame, search=False):
+        """
+        Copy frame into a free slot (replacing a stale unread one) and return its
+        frame ID. search makes the detector search the whole frame for hands.
+        """
+        if self.shm is None:
+            self.start(frame.shape)
+        elif frame.shape != self.shape:
+            print(f"Frame shape changed from {self.shape} to {frame.shape}, reallocating the inference buffers.")
+            self._release_buffers()
+            self.start(frame.shape)
+
+        with self.state.get_lock():
+            states = self.state[:2]
+            if FREE in states:
+                slot = states.index(FREE)
+            elif READY in states:
+                slot = states.index(READY)
+                self.replaced += 1
+            else:
+                return None
+            self.state[slot] = WRITING
+
+        np.copyto(self.frames[slot], frame)
+        self.next_frame_id += 1
+        with self.state.get_lock():
+            self.state[2 + slot] = self.next_frame_id
+            self.state[4 + slot] = search
+            self.state[slot] = READY
+        self.new_frame.set()
+        self.submitted += 1
+        return self.next_frame_id
+
+    def poll(self):
+        """Take the newest available result and restart the worker if it died. Returns the latest landmarks."""
+        if self.process is None:
+            return self.landmarks
+        while True:
+            try:
+                frame_id, landmarks, handedness, inference_time = self.results.get_nowait()
+            except queue.Empty:
+                break
+            except (EOFError, OSError):
+                break
+            if frame_id > self.result_id:
+                self.result_id = frame_id
+                self.landmarks, self.handedness, self.inference_time = landmarks, handedness, inference_time
+
+        self._restart_if_dead()
+        return self.landmarks
+
+    def _restart_if_dead(self):
+        # Called from the frame loop and from wait_ready() on a startup thread
+        with self.launch_lock:
+            if self.process is None or self.process.is_alive() or self.stop_event.is_set():
+                return
+            now = time.perf_counter()
+            if now - self.last_death > self.restart_delay:
+                print(f"Inference worker exited with code {self.process.exitcode}, restarting.")
+                self.last_death = now
+                self.restarts += 1
+                self._launch()
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "replaced": self.replaced,
+            "result_id": self.result_id,
+            "frames_behind": self.next_frame_id - self.result_id,
+            "inference_ms": self.inference_time * 1000,
+            "restarts": self.restarts,
+        }
+
+    def stop(self, timeout=5.0):
+        """
+        Ask the worker to shut down and wait for it, so it can close its detector
+        and landmark recording. It is only terminated if it does not exit in time.
+        """
+        if self.process is not None:
+            self.stop_event.set()
+            self.new_frame.set()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                print("Inference worker did not shut down, terminating it.")
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        self._release_buffers()
@@ -0,0 +1,191 @@
+"""
+Offline gesture labeling for recorded footage.
+
+Splits video files and image folders into shards of frames and labels them on a
+process pool with one HandDetector per worker. Each shard writes its
+per-frame timeline to a part file as soon as it finishes. These part files are
+the checkpoint: a rerun skips them. When all shards of an input are done they
+are merged into <out>/<input>-<hash>.csv, where the hash of the input's absolute
+path keeps inputs with the same file name apart, and gesture counts go to
+<out>/summary.json.
+
+    python label.py session1.mp4 session2.mp4 frames_dir/ --out labels --workers 8
+"""
+import argparse
+import collections
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+TIMELINE_FIELDS = ["frame", "timestamp", "hands", "gesture", "gestures", "handedness"]
+
+# Detector settings of this worker process, set by _init_worker, and its
+# image-mode detector, built the first time the worker gets an image shard
+_detector_kwargs = {}
+_image_detector = None
+
+
+def _init_worker(detector_kwargs):
+    _detector_kwargs.update(detector_kwargs)
+
+
+def _detector(images):
+    """
+    A detector for one shard. Image mode keeps no state between frames, so one
+    per worker is reused; video mode tracks hands across frames, so every shard
+    gets a fresh one and its labels do not depend on which shard ran before it.
+    """
+    global _image_detector
+    import utils
+    if not images:
+        return utils.HandDetector(draw=False, **_detector_kwargs)
+    if _image_detector is None:
+        _image_detector = utils.HandDetector(mode=True, draw=False, **_detector_kwargs)
+    return _image_detector
+
+
+def list_images(path):
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def count_frames(path):
+    if os.path.isdir(path):
+        return len(list_images(path)), 0.0
+    cap = cv2.VideoCapture(path)
+    frames, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 0.0
+    cap.release()
+    return frames, fps
+
+
+def iter_frames(path, start, stop):
+    """Decode frames [start, stop) one at a time, seeking instead of reading from the beginning."""
+    if os.path.isdir(path):
+        for index, image in enumerate(list_images(path)[start:stop], start):
+            yield index, cv2.imread(image)
+        return
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    frame = None
+    for index in range(start, stop):
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        yield index, frame
+    cap.release()
+
+
+def input_name(path):
+    """Output name of an input: its base name plus a hash of its absolute path, so a/x.mp4 and b/x.mp4 do not collide."""
+    path = os.path.abspath(path)
+    return f"{os.path.basename(path)}-{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+
+
+def part_path(out_dir, name, start, stop):
+    # Both ends are in the name, so a rerun with another --shard-size never mistakes a part for a longer shard
+    return os.path.join(out_dir, "parts", f"{name}.{start:09d}-{stop:09d}.csv")
+
+
+def label_shard(path, name, start, stop, fps, out_dir):
+    """Label one shard in a worker and write its part file atomically. Returns gesture counts."""
+    import utils
+    images = os.path.isdir(path)
+    detector = _detector(images)
+    counts = collections.Counter()
+    rows = []
+    try:
+        for index, frame in iter_frames(path, start, stop):
+            if frame is None:
+                continue
+            detector.find_hands(frame, draw=False)
+            landmarks = detector.landmarks
+            gestures = utils.classify_batch(landmarks).tolist() if len(landmarks) else []
+            gesture = gestures[0] if gestures else "Unknown"
+            counts[gesture] += 1
+            rows.append([index, f"{index / fps:.3f}" if fps else "", len(landmarks), gesture,
+                         "|".join(gestures), "|".join(detector.handedness)])
+    finally:
+        if not images:
+            detector.hands.close()
+
+    target = part_path(out_dir, name, start, stop)
+    with open(target + ".tmp", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+    os.replace(target + ".tmp", target)
+    return name, start, stop - start, dict(counts)
+
+
+def merge_parts(out_dir, name, ranges):
+    """Concatenate the part files of one input into its timeline and return its gesture counts."""
+    counts = collections.Counter()
+    with open(os.path.join(out_dir, f"{name}.csv"), "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(TIMELINE_FIELDS)
+        for start, stop in ranges:
+            with open(part_path(out_dir, name, start, stop), newline="") as f:
+                for row in csv.reader(f):
+                    writer.writerow(row)
+                    counts[row[3]] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Label gestures in video files and image folders.")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories of images")
+    parser.add_argument("--out", default="labels")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-size", type=int, default=300, help="Frames per shard")
+    parser.add_argument("--detection-con", type=float, default=0.75)
+    parser.add_argument("--restart", action="store_true", help="Ignore finished shards from a previous run")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.join(args.out, "parts"), exist_ok=True)
+    shards, inputs = [], {}
+    for path in args.inputs:
+        name = input_name(path)
+        if name in inputs:
+            continue  # The same input given twice
+        frames, fps = count_frames(path)
+        ranges = [(start, min(start + args.shard_size, frames)) for start in range(0, frames, args.shard_size)]
+        inputs[name] = ranges
+        for start, stop in ranges:
+            if not args.restart and os.path.exists(part_path(args.out, name, start, stop)):
+                continue  # Finished in an earlier run
+            shards.append((path, name, start, stop, fps, args.out))
+
+    total = sum(stop - start for _, _, start, stop, _, _ in shards)
+    print(f"{len(shards)} shards ({total} frames) to label on {args.workers} workers, "
+          f"{sum(len(s) for s in inputs.values()) - len(shards)} already done.")
+
+    started, done = time.perf_counter(), 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init_worker,
+                             initargs=({"detection_con": args.detection_con},)) as pool:
+        futures = [pool.submit(label_shard, *shard) for shard in shards]
+        for future in as_completed(futures):
+            name, start, frames, _ = future.result()
+            done += frames
+            elapsed = time.perf_counter() - started
+            print(f"{name} [{start}:{start + frames}] done, {done}/{total} frames, {done / elapsed:.1f} fps")
+
+    summary = {name: dict(merge_parts(args.out, name, ranges)) for name, ranges in inputs.items()}
+    totals = collections.Counter()
+    for counts in summary.values():
+        totals.update(counts)
+    summary["total"] = dict(totals)
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary["total"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import csv
+import json
+import time
+import numpy as np
+import pygame as pg
+
+
+class StageRing:
+    """Fixed-size ring buffer of durations (seconds) for one stage."""
+
+    def __init__(self, size):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def add(self, seconds):
+        self.values[self.count % len(self.values)] = seconds
+        self.count += 1
+
+    def filled(self):
+        return self.values[:min(self.count, len(self.values))]
+
+
+class Profiler:
+    """
+    Named stage timers recorded into fixed-size ring buffers, with p50/p95/p99
+    summaries, an on-screen overlay and periodic JSON/CSV export.
+
+    Use t = profiler.start() ... profiler.stop("stage", t) around a step. While
+    disabled start() returns 0 and stop() returns at once, so the timers can
+    stay in the frame loop.
+    """
+
+    def __init__(self, enabled=False, size=512, export_path=None, export_interval=10.0):
+        self.enabled = enabled
+        self.size = size
+        self.stages = {}
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.last_export = time.perf_counter()
+        self.font = None
+        self.overlay_surface = None
+        self.overlay_frames = 0
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, start):
+        if not start:
+            return
+        self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        ring = self.stages.get(name)
+        if ring is None:
+            ring = self.stages[name] = StageRing(self.size)
+        ring.add(seconds)
+
+    def summary(self):
+        """Percentiles in milliseconds for every stage."""
+        out = {}
+        for name, ring in self.stages.items():
+            values = ring.filled() * 1000
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            out[name] = {"count": ring.count, "mean_ms": float(values.mean()),
+                         "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+        return out
+
+    def overlay(self, every=15):
+        """Surface listing the stage percentiles; re-rendered only every few frames."""
+        self.overlay_frames += 1
+        if self.overlay_surface is not None and self.overlay_frames % every:
+            return self.overlay_surface
+        if self.font is None:
+            self.font = pg.font.Font(None, 22)
+
+        lines = [f"{'stage':<18}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<18}{stats['p50_ms']:8.2f}{stats['p95_ms']:8.2f}{stats['p99_ms']:8.2f}")
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(line.get_width() for line in rendered) + 12
+        surface = pg.Surface((width, len(rendered) * 18 + 10))
+        surface.fill((20, 20, 20))
+        for i, line in enumerate(rendered):
+            surface.blit(line, (6, 5 + i * 18))
+        self.overlay_surface = surface
+        return surface
+
+    def maybe_export(self):
+        """Write the summary to export_path (.json or .csv) once per export_interval."""
+        if not self.enabled or not self.export_path:
+            return
+        now = time.perf_counter()
+        if now - self.last_export < self.export_interval:
+            return
+        self.last_export = now
+        self.export(self.export_path)
+
+    def export(self, path):
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+                for name, stats in summary.items():
+                    writer.writerow([name, stats["count"], stats["mean_ms"], stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]])
+        else:
+            with open(path, "w") as f:
+                json.dump({"time": time.time(), "stages": summary}, f, indent=2)
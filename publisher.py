@@ -0,0 +1,237 @@
+import collections
+import socket
+import socketserver
+import threading
+import paho.mqtt.client as mqtt_client
+
+
+class MqttPublisher:
+    """
+    Long-lived MQTT publisher. Connects once, lets paho run its network loop
+    (and reconnect with backoff) in the background and sends messages from a
+    bounded queue, so publish() never blocks the frame loop.
+    """
+
+    def __init__(self, broker, port, topic, client_id, max_queue=32, min_backoff=1, max_backoff=30):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.client_id = client_id
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.pending = collections.deque()
+        self.max_queue = max_queue
+        self.cond = threading.Condition()
+        self.connected = False
+        self.running = False
+        self.client = None
+        self.thread = None
+
+        # Counters
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.reconnects = 0
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.client = mqtt_client.Client(self.client_id)
+        # self.client.username_pw_set(username, password)  # Uncomment if username/password is required
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.reconnect_delay_set(self.min_backoff, self.max_backoff)
+        # connect_async + loop_start retries the first connection too, so an
+        # unreachable broker never raises into the game
+        self.client.connect_async(self.broker, self.port)
+        self.client.loop_start()
+        self.thread = threading.Thread(target=self._sender, name="mqtt-sender", daemon=True)
+        self.thread.start()
+        return self
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print("Connected to MQTT Broker!")
+            with self.cond:
+                self.connected = True
+                self.cond.notify_all()
+        else:
+            print(f"Failed to connect, return code {rc}\n")
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self.cond:
+            self.connected = False
+        if self.running:
+            self.reconnects += 1
+
+    def _on_publish(self, client, userdata, mid):
+        self.sent += 1
+
+    def publish(self, values, message):
+        """
+        Queue a message without blocking. Every message is kept while the queue
+        has room (each one is a round result); only when it is full is a repeat
+        of the newest message coalesced, or else the oldest one dropped.
+        """
+        out = ",".join([str(x) for x in values])
+        out += f",{message}"
+        with self.cond:
+            if len(self.pending) >= self.max_queue:
+                if self.pending[-1] == out:
+                    self.coalesced += 1
+                    return
+                self.pending.popleft()  # Drop the oldest message
+                self.dropped += 1
+            self.pending.append(out)
+            self.queued += 1
+            self.cond.notify_all()
+
+    def _sender(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: not self.running or (self.connected and self.pending), timeout=0.5)
+                if not self.running:
+                    return
+                if not (self.connected and self.pending):
+                    continue
+                out = self.pending.popleft()
+
+            info = self.client.publish(self.topic, out)
+            if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
+                # Connection dropped between the check and the publish, retry after reconnecting
+                with self.cond:
+                    self.connected = self.client.is_connected()
+                    if len(self.pending) < self.max_queue:
+                        self.pending.appendleft(out)
+                    else:
+                        self.dropped += 1
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "pending": len(self.pending),
+            "reconnects": self.reconnects,
+            "connected": self.connected,
+        }
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        if self.client is not None:
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.client = None
+
+
+class LocalBroker:
+    """
+    Minimal in-process MQTT 3.1.1 broker stand-in. It accepts connections,
+    answers pings and records every PUBLISH it receives, which is enough to
+    exercise MqttPublisher without a real broker. drop_clients() cuts every open
+    connection, as a broker restart or network loss would.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        broker = self
+        self.messages = []
+        self.connections = 0
+        self.clients = set()
+        self.lock = threading.Lock()
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                broker._serve(self.request)
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="local-broker", daemon=True)
+        self.thread.start()
+        return self
+
+    def drop_clients(self):
+        with self.lock:
+            clients = list(self.clients)
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # Already closed by the client
+
+    def stop(self):
+        self.server.shutdown()
+        self.drop_clients()
+        self.server.server_close()
+
+    def _serve(self, sock):
+        with self.lock:
+            self.clients.add(sock)
+        try:
+            with sock.makefile("rb") as stream:
+                while True:
+                    packet = self._read_packet(stream)
+                    if packet is None or not self._handle(sock, *packet):
+                        return
+        except OSError:
+            return  # Client reset the connection or it was dropped, same as a disconnect
+        finally:
+            with self.lock:
+                self.clients.discard(sock)
+
+    @staticmethod
+    def _read_packet(stream):
+        """The next (header, body) from stream, or None at end of stream (also mid-packet)."""
+        header = stream.read(1)
+        if not header:
+            return None
+        # Remaining length is a variable length integer
+        length, shift = 0, 0
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                return None
+            length |= (byte[0] & 0x7F) << shift
+            shift += 7
+            if not byte[0] & 0x80:
+                break
+        body = stream.read(length)
+        if len(body) < length:
+            return None
+        return header, body
+
+    def _handle(self, sock, header, body):
+        """Act on one packet; returns False when the client disconnects."""
+        packet_type = header[0] >> 4
+        if packet_type == 1:  # CONNECT
+            with self.lock:
+                self.connections += 1
+            sock.sendall(b"\x20\x02\x00\x00")
+        elif packet_type == 3:  # PUBLISH
+            topic_length = int.from_bytes(body[:2], "big")
+            topic = body[2:2 + topic_length].decode()
+            offset = 2 + topic_length
+            qos = (header[0] >> 1) & 0x03
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+                sock.sendall(b"\x40\x02" + packet_id)  # PUBACK
+            with self.lock:
+                self.messages.append((topic, body[offset:].decode()))
+        elif packet_type == 12:  # PINGREQ
+            sock.sendall(b"\xd0\x00")
+        elif packet_type == 14:  # DISCONNECT
+            return False
+        return True
@@ -0,0 +1,189 @@
+import os
+import time
+import numpy as np
+
+MAGIC = b"RPSLMK1\n"
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u2"), ("max_hands", "<u2"),
+    ("width", "<u4"), ("height", "<u4"), ("scale", "<f4"), ("reserved", "V8"),
+])
+# Landmarks are stored as int16 fixed point: 1/8 pixel resolution over +-4096 pixels
+LANDMARK_SCALE = 8.0
+HANDEDNESS = {"Left": 1, "Right": 2}
+HANDEDNESS_NAMES = {1: "Left", 2: "Right"}
+
+
+def record_dtype(max_hands):
+    return np.dtype([
+        ("timestamp", "<f8"), ("frame_id", "<u4"), ("hands", "u1"),
+        ("handedness", "u1", (max_hands,)), ("score", "<f2", (max_hands,)),
+        ("landmarks", "<i2", (max_hands, 21, 2)),
+    ])
+
+
+class LandmarkRecorder:
+    """
+    Appends per-frame landmarks, handedness, confidence and timestamps to a
+    fixed-record binary file that LandmarkRecording can memory-map. Reopening an
+    existing file continues appending to it.
+    """
+
+    def __init__(self, path, max_hands=2, flush_every=30):
+        self.path = path
+        self.max_hands = max_hands
+        self.flush_every = flush_every
+        self.dtype = record_dtype(max_hands)
+        self.record = np.zeros(1, dtype=self.dtype)
+        self.file = None
+        self.frames = 0
+
+    def _open(self, width, height):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER_DTYPE.itemsize
+        if exists:
+            header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)[0]
+            if header["magic"] != MAGIC or header["max_hands"] != self.max_hands:
+                raise ValueError(f"{self.path} is not a landmark recording with max_hands={self.max_hands}")
+            # Drop a partial record left by an interrupted write
+            size = os.path.getsize(self.path) - HEADER_DTYPE.itemsize
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_DTYPE.itemsize + size // self.dtype.itemsize * self.dtype.itemsize)
+        self.file = open(self.path, "ab")
+        if not exists:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (MAGIC, 1, self.max_hands, width, height, LANDMARK_SCALE, b"")
+            self.file.write(header.tobytes())
+
+    def append(self, landmarks, handedness=(), scores=(), shape=None, timestamp=None, frame_id=None):
+        """Write one frame of (hands, 21, 2) pixel landmarks; shape is the frame shape, needed for the first record."""
+        if self.file is None:
+            h, w = shape[:2] if shape is not None else (0, 0)
+            self._open(w, h)
+
+        record = self.record[0]
+        hands = min(len(landmarks), self.max_hands)
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["frame_id"] = self.frames if frame_id is None else frame_id
+        record["hands"] = hands
+        record["handedness"] = 0
+        record["score"] = 0
+        record["landmarks"] = 0
+        for i in range(hands):
+            record["handedness"][i] = HANDEDNESS.get(handedness[i], 0) if i < len(handedness) else 0
+            record["score"][i] = scores[i] if i < len(scores) else 0
+        np.clip(np.rint(np.asarray(landmarks[:hands]) * LANDMARK_SCALE), -32768, 32767, out=record["landmarks"][:hands], casting="unsafe")
+
+        self.file.write(self.record.tobytes())
+        self.frames += 1
+        if self.frames % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LandmarkRecording:
+    """Memory-mapped, random-access view of a file written by LandmarkRecorder."""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        self.max_hands = int(header["max_hands"])
+        self.width, self.height = int(header["width"]), int(header["height"])
+        self.scale = float(header["scale"])
+        self.dtype = record_dtype(self.max_hands)
+        count = (os.path.getsize(path) - HEADER_DTYPE.itemsize) // self.dtype.itemsize
+        self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        """Records for an index or slice, as a view into the mapped file."""
+        return self.records[index]
+
+    def landmarks(self, index):
+        """(hands, 21, 2) float32 pixel landmarks of one frame."""
+        record = self.records[index]
+        return record["landmarks"][:record["hands"]].astype(np.float32) / self.scale
+
+    def handedness(self, index):
+        record = self.records[index]
+        return [HANDEDNESS_NAMES.get(int(h), "Unknown") for h in record["handedness"][:record["hands"]]]
+
+    def primary_hands(self, start=0, stop=None):
+        """(frames, 21, 2) landmarks of the first hand over a slice (NaN where no hand was seen)."""
+        records = self.records[start:stop]
+        out = records["landmarks"][:, 0].astype(np.float32) / self.scale
+        out[records["hands"] == 0] = np.nan
+        return out
+
+
+class ReplaySource:
+    """
+    Feeds game_screen from a recording instead of the camera and the inference
+    worker. read() behaves like the camera (blank frames of the recorded size)
+    and advances the replay; poll() returns that frame's recorded landmarks.
+    With realtime the original timing is kept, otherwise frames come as fast as
+    the consumer asks for them.
+    """
+
+    def __init__(self, path, realtime=True, start=0, stop=None, loop=False):
+        self.recording = LandmarkRecording(path)
+        self.realtime = realtime
+        self.start_index = start
+        self.stop_index = len(self.recording) if stop is None else min(stop, len(self.recording))
+        self.loop = loop
+        self.index = start - 1
+        self.frame = np.zeros((max(self.recording.height, 1), max(self.recording.width, 1), 3), dtype=np.uint8)
+        self.clock_start = None
+
+        self.landmarks = np.empty((0, 21, 2), dtype=np.float32)
+        self.handedness = []
+        self.result_id = 0
+        self.inference_time = 0.0
+
+    def read(self):
+        self.index += 1
+        if self.index >= self.stop_index:
+            # An empty range is end of file even when looping
+            if not self.loop or self.start_index >= self.stop_index:
+                return False, None
+            self.index = self.start_index
+            self.clock_start = None
+
+        if self.realtime:
+            timestamp = self.recording[self.index]["timestamp"]
+            if self.clock_start is None:
+                self.clock_start = (time.perf_counter(), timestamp)
+            delay = (timestamp - self.clock_start[1]) - (time.perf_counter() - self.clock_start[0])
+            if delay > 0:
+                time.sleep(delay)
+
+        self.landmarks = self.recording.landmarks(self.index)
+        self.handedness = self.recording.handedness(self.index)
+        self.result_id += 1
+        self.frame[:] = 0
+        return True, self.frame
+
+    # The inference worker interface, so game_screen can use this in its place
+    def submit(self, frame, search=False):
+        return self.result_id
+
+    def poll(self):
+        return self.landmarks
+
+    def isOpened(self):
+        return len(self.recording) > 0
+
+    def stats(self):
+        return {"index": self.index, "frames": len(self.recording)}
+
+    def release(self):
+        pass
+
+    def stop(self):
+        pass
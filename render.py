@@ -0,0 +1,345 @@
+import collections
+import sys
+import pygame as pg
+import numpy as np
+import cv2
+
+
+class TextRenderer:
+    """
+    Caches fonts by size and rendered text surfaces by (text, size, color), so
+    text that does not change between frames is rendered only once.
+    """
+
+    def __init__(self, font_path='font.ttf', max_surfaces=128):
+        self.font_path = font_path
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = collections.OrderedDict()  # LRU order, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.font_loads = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pg.font.Font(self.font_path, size)
+            self.fonts[size] = font
+            self.font_loads += 1
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "font_loads": self.font_loads,
+            "cached_surfaces": len(self.surfaces),
+        }
+
+
+class PreviewCompositor:
+    """
+    Camera preview that writes into one preallocated buffer shared with a pygame
+    Surface. Resizing and mirroring happen in a single warpAffine pass into that
+    buffer and the Surface reads the BGR bytes directly, so no arrays or
+    Surfaces are allocated per frame.
+    """
+
+    def __init__(self, size=(320, 250), mirror=True):
+        self.size = size
+        self.mirror = mirror
+        self.buffer = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        self.surface = pg.image.frombuffer(self.buffer, size, "BGR")
+        self.source_shape = None
+        self.matrix = None
+
+    def _build_matrix(self, shape):
+        h, w = shape[:2]
+        sx, sy = self.size[0] / w, self.size[1] / h
+        # Map pixel centres, mirrored horizontally for a selfie view when requested
+        if self.mirror:
+            row_x = [-sx, 0, self.size[0] - 0.5 - 0.5 * sx]
+        else:
+            row_x = [sx, 0, 0.5 * sx - 0.5]
+        self.matrix = np.array([row_x, [0, sy, 0.5 * sy - 0.5]], dtype=np.float64)
+        self.source_shape = shape
+
+    def update(self, frame):
+        """Compose frame into the shared buffer and return the preview Surface."""
+        if frame.shape != self.source_shape:
+            self._build_matrix(frame.shape)
+        cv2.warpAffine(frame, self.matrix, self.size, dst=self.buffer, flags=cv2.INTER_LINEAR,
+                       borderMode=cv2.BORDER_REPLICATE)
+        return self.surface
+
+
+class DirtyCompositor:
+    """
+    Layered compositor that only pushes changed regions to the display.
+
+    The background and static layers (buttons, titles, result sprites) are
+    cached in one base surface. Dynamic elements are submitted every frame with
+    draw(key, ...); an element drawn with the same surface at the same place as
+    in the previous frame costs nothing. Changed regions are restored from the
+    base, the elements overlapping them are redrawn clipped to the region and
+    only those rectangles are passed to pg.display.update().
+    """
+
+    def __init__(self, screen, background=None, debug=False):
+        self.screen = screen
+        self.rect = screen.get_rect()
+        self.base = pg.Surface(self.rect.size)
+        if pg.display.get_surface() is not None:
+            self.base = self.base.convert()
+        if background is not None:
+            self.base.blit(background, (0, 0))
+        self.items = {}  # Elements drawn in the previous frame
+        self.frame_items = {}  # Elements submitted for the current frame
+        self.static_dirty = []
+        self.debug_rects = []
+        self.full = True
+        self.debug = debug
+        self.debug_font = None
+
+        self.frames = 0
+        self.redraw_fraction = 0.0
+        self.avg_redraw_fraction = 0.0
+
+    def set_background(self, background):
+        """Replace the base with background, dropping all static layers."""
+        self.base.blit(background, (0, 0))
+        self.full = True
+
+    def add_static(self, surface, pos):
+        self.static_dirty.append(self.base.blit(surface, pos))
+
+    def add_static_rect(self, color, rect):
+        self.static_dirty.append(pg.draw.rect(self.base, color, rect))
+
+    def draw(self, key, surface, pos, changed=False):
+        """Submit a dynamic element; changed forces a redraw when the surface contents were updated in place."""
+        self.frame_items[key] = (surface, pg.Rect(pos, surface.get_size()), changed)
+
+    def invalidate(self):
+        """Redraw the whole screen on the next present(), e.g. after a pop-up drew over it."""
+        self.full = True
+
+    def _dirty_rects(self):
+        dirty = self.static_dirty + self.debug_rects
+        for key, (surface, rect, _) in self.items.items():
+            new = self.frame_items.get(key)
+            if new is None or new[2] or new[0] is not surface or new[1] != rect:
+                dirty.append(rect)
+        for key, (surface, rect, changed) in self.frame_items.items():
+            old = self.items.get(key)
+            if old is None or changed or old[0] is not surface or old[1] != rect:
+                dirty.append(rect)
+        dirty = [rect.clip(self.rect) for rect in dirty]
+        return [rect for rect in dirty if rect.width and rect.height]
+
+    def present(self):
+        if self.full:
+            self.screen.blit(self.base, (0, 0))
+            for surface, rect, _ in self.frame_items.values():
+                self.screen.blit(surface, rect)
+            dirty = [self.rect]
+        else:
+            dirty = self._dirty_rects()
+            for region in dirty:
+                # Restore the region and redraw what overlaps it, clipped so
+                # translucent pixels outside the region are not blended twice
+                self.screen.set_clip(region)
+                self.screen.blit(self.base, region, region)
+                for surface, rect, _ in self.frame_items.values():
+                    if rect.colliderect(region):
+                        self.screen.blit(surface, rect)
+            self.screen.set_clip(None)
+
+        area = sum(rect.width * rect.height for rect in dirty)
+        self.redraw_fraction = min(1.0, area / (self.rect.width * self.rect.height))
+        self.avg_redraw_fraction += (self.redraw_fraction - self.avg_redraw_fraction) * 0.05
+        self.frames += 1
+
+        # The debug overlay is erased by treating it as dirty in the next frame
+        self.debug_rects = self._draw_debug(dirty) if self.debug else []
+        pg.display.update(dirty + self.debug_rects)
+
+        self.items, self.frame_items = self.frame_items, {}
+        self.static_dirty = []
+        self.full = False
+        return dirty
+
+    def _draw_debug(self, dirty):
+        rects = [pg.draw.rect(self.screen, (255, 0, 255), rect, 1) for rect in dirty]
+        if self.debug_font is None:
+            self.debug_font = pg.font.Font(None, 24)
+        label = self.debug_font.render(f"redraw {self.redraw_fraction * 100:.1f}% (avg {self.avg_redraw_fraction * 100:.1f}%)",
+                                       True, (255, 0, 255), (0, 0, 0))
+        rects.append(self.screen.blit(label, (8, self.rect.height - label.get_height() - 8)))
+        return rects
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "redraw_fraction": self.redraw_fraction,
+            "avg_redraw_fraction": self.avg_redraw_fraction,
+        }
+
+
+class Overlay:
+    """
+    A sprite anchored to a hand: centred on landmark anchor (plus offset, in
+    sprite sizes) with a height of scale times the distance between the two
+    landmarks in size_from.
+    """
+
+    def __init__(self, sprite, anchor=11, size_from=(9, 12), scale=1.0, offset=(0.0, 0.0)):
+        self.sprite = sprite
+        self.anchor = anchor
+        self.size_from = size_from
+        self.scale = scale
+        self.offset = offset
+
+
+class OverlayCompositor:
+    """
+    Alpha-blends sprites into camera frames in place.
+
+    Sprites are stored premultiplied by their alpha and resized variants are
+    kept in an LRU cache, keyed by height rounded to a bucket, together with the
+    inverse alpha. Blending a variant is then two saturating OpenCV operations
+    on the clipped frame region (frame * (1 - alpha) + premultiplied sprite),
+    written straight into the frame; fully opaque sprites are plainly copied.
+    With mirror, sprites are flipped so they read correctly in the mirrored preview.
+    """
+
+    def __init__(self, max_variants=64, bucket=8, mirror=True):
+        self.max_variants = max_variants
+        self.bucket = bucket
+        self.mirror = mirror
+        self.sprites = {}
+        self.variants = collections.OrderedDict()  # LRU order, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.blended = 0
+
+    def add_sprite(self, name, image, opacity=1.0):
+        """Register a BGR, BGRA or grayscale image; opacity scales its alpha."""
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        alpha = image[..., 3:].astype(np.float32) * (opacity / 255)
+        # Premultiplied before resizing, so edges do not pick up the colour of transparent pixels
+        premultiplied = np.empty(image.shape, dtype=np.uint8)
+        premultiplied[..., :3] = np.rint(image[..., :3] * alpha)
+        premultiplied[..., 3:] = np.rint(alpha * 255)
+        self.sprites[name] = premultiplied
+        self.variants = collections.OrderedDict((k, v) for k, v in self.variants.items() if k[0] != name)
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def variant(self, name, height):
+        """(premultiplied BGR, inverse alpha as 3 channels or None when opaque) for a sprite at a bucketed height."""
+        height = max(self.bucket, int(round(height / self.bucket)) * self.bucket)
+        key = (name, height)
+        variant = self.variants.get(key)
+        if variant is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return variant
+
+        self.misses += 1
+        source = self.sprites[name]
+        width = max(1, int(source.shape[1] * height / source.shape[0]))
+        sprite = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+        if self.mirror:
+            sprite = sprite[:, ::-1]
+        inverse = None
+        if sprite[..., 3].min() < 255:
+            inverse = np.ascontiguousarray(np.repeat(255 - sprite[..., 3:], 3, axis=2))
+        variant = self.variants[key] = (np.ascontiguousarray(sprite[..., :3]), inverse)
+        if len(self.variants) > self.max_variants:
+            self.variants.popitem(last=False)
+        return variant
+
+    def blend(self, frame, name, center, height):
+        """Blend a sprite centred at center (x, y) into frame in place. Returns whether any of it was visible."""
+        sprite, inverse = self.variant(name, height)
+        h, w = sprite.shape[:2]
+        x, y = int(center[0]) - w // 2, int(center[1]) - h // 2
+        # Clip the sprite rectangle to the frame
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return False
+
+        region = frame[y0:y1, x0:x1]
+        source = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+        if inverse is None:
+            np.copyto(region, source)
+        else:
+            cv2.multiply(region, inverse[y0 - y:y1 - y, x0 - x:x1 - x], dst=region, scale=1 / 255)
+            cv2.add(region, source, dst=region)
+        self.blended += 1
+        return True
+
+    def draw(self, frame, hand, overlays):
+        """Blend every overlay anchored to one hand's (21, 2) landmarks into frame."""
+        drawn = 0
+        for overlay in overlays:
+            a, b = overlay.size_from
+            height = overlay.scale * float(np.hypot(*(hand[b] - hand[a])))
+            if height < 1 or not np.isfinite(height):
+                continue
+            center = hand[overlay.anchor]
+            if overlay.offset != (0.0, 0.0):
+                center = center + np.multiply(overlay.offset, height)
+            drawn += self.blend(frame, overlay.sprite, center, height)
+        return drawn
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "variants": len(self.variants), "blended": self.blended}
+
+
+class SurfaceGrabber:
+    """
+    Downscaled BGRA copies of a Surface (such as the screen) for streaming.
+    The scale goes into one reused Surface and the copy is a straight memcpy
+    of its pixels when the layout allows, about 0.6 ms at 640x360.
+    """
+
+    def __init__(self, size=(640, 360)):
+        self.size = size
+        self.scaled = None
+
+    def grab(self, surface, out=None):
+        if self.scaled is None or self.scaled.get_bitsize() != surface.get_bitsize():
+            self.scaled = pg.Surface(self.size, 0, surface)
+        pg.transform.scale(surface, self.size, self.scaled)
+        width, height = self.size
+        if out is None or out.shape != (height, width, 4):
+            out = np.empty((height, width, 4), dtype=np.uint8)
+        if self.scaled.get_bitsize() == 32 and self.scaled.get_masks()[:3] == (0xFF0000, 0xFF00, 0xFF) and sys.byteorder == "little":
+            # XRGB pixels are BGRX bytes in memory
+            pixels = np.frombuffer(self.scaled.get_buffer(), dtype=np.uint8)
+            np.copyto(out, pixels.reshape(height, self.scaled.get_pitch() // 4, 4)[:, :width])
+        else:
+            out[:] = np.frombuffer(pg.image.tobytes(self.scaled, "BGRA"), dtype=np.uint8).reshape(height, width, 4)
+        return out
@@ -0,0 +1,54 @@
+import collections
+import pygame as pg
+import numpy as np
+
+
+class FrameScheduler:
+    """
+    Paces every UI loop. Each screen has a target FPS; a target of None puts the
+    screen in idle mode, where frame() blocks until an input event arrives so
+    static screens do not redraw (or use CPU) while nothing changes.
+    Frame times are recorded per screen.
+    """
+
+    def __init__(self, targets, idle_timeout=1000, history=600):
+        self.targets = targets
+        self.idle_timeout = idle_timeout
+        self.clock = pg.time.Clock()
+        self.frame_times = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.screen = None
+        self.dt = 0.0  # Seconds since the previous frame of the current screen
+
+    def frame(self, screen):
+        """Wait until the next frame of screen is due and return the pending events."""
+        fps = self.targets.get(screen)
+        if fps is None:
+            # Idle mode: sleep in SDL until something happens (or the timeout passes)
+            event = pg.event.wait(self.idle_timeout)
+            events = [] if event.type == pg.NOEVENT else [event]
+            events += pg.event.get()
+            ms = self.clock.tick()
+        else:
+            ms = self.clock.tick(fps)
+            events = pg.event.get()
+
+        # The first frame after switching screens includes the other screen's time
+        if screen == self.screen:
+            self.frame_times[screen].append(ms)
+            self.dt = ms / 1000
+        else:
+            self.screen = screen
+            self.dt = 0.0
+        return events
+
+    def stats(self, screen):
+        times = np.array(self.frame_times[screen], dtype=np.float64)
+        if len(times) == 0:
+            return {"frames": 0}
+        return {
+            "frames": len(times),
+            "fps": float(1000 / times.mean()) if times.mean() > 0 else 0.0,
+            "mean_ms": float(times.mean()),
+            "p95_ms": float(np.percentile(times, 95)),
+            "max_ms": float(times.max()),
+        }
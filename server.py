@@ -0,0 +1,296 @@
+"""
+Headless multi-session game server.
+
+One asyncio process hosts many independent GameSessions, one per connection.
+Clients stream newline-delimited JSON over a local TCP (or Unix) socket and
+get the session's events back the same way.
+
+Client messages:
+    {"type": "hello", "players": 1, "bot": "markov"}     optional, first message
+    {"gestures": ["rock", "Unknown"], "t": 12.5, "seq": 7}
+    {"landmarks": [[[x, y], ...21], ...], "handedness": ["Left"], "width": 1280, "t": 12.5, "seq": 7}
+    {"type": "stats"}
+t is the frame time in seconds (the server clock when missing) and seq is
+echoed back on the events of that frame. Every frame with events gets one line:
+    {"seq": 7, "events": [{"type": "result", "winner": "Player", ...}]}
+
+    python server.py --port 8765
+    python server.py --load-test --sessions 500 --seconds 20 --mode landmarks
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from bots import BOTS, make_bot
+from game import GameSession
+
+SESSION_OPTIONS = ("players", "countdown", "limit", "explicit_interval")
+# Accepted range of every numeric hello option; players is 1 (against a bot) or 2
+OPTION_RANGES = {"players": (1, 2), "countdown": (0.1, 60.0), "limit": (1, 600), "explicit_interval": (0.0, 3600.0)}
+
+
+class GameServer:
+    def __init__(self, host="127.0.0.1", port=8765, path=None, **session_kwargs):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.session_kwargs = session_kwargs
+        self.server = None
+        self.sessions = {}
+        self.next_session = 0
+        self.total_sessions = 0
+        self.messages = 0
+        self.events = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    async def start(self):
+        if self.path:
+            self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        session_id = self.next_session
+        self.next_session += 1
+        self.total_sessions += 1
+        session = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.errors += 1
+                    continue
+                if not isinstance(message, dict):
+                    self.errors += 1
+                    continue
+                kind = message.get("type")
+
+                if kind == "stats":
+                    writer.write(json.dumps(self.stats()).encode() + b"\n")
+                    await writer.drain()
+                    continue
+                # A malformed message is counted and skipped, the connection stays open
+                try:
+                    now = float(message.get("t", loop.time()))
+                    if kind == "hello" or session is None:
+                        options = self.session_options(message) if kind == "hello" else {}
+                        if kind == "hello" and message.get("bot") in BOTS:
+                            options["bot"] = make_bot(message["bot"])
+                        session = self.sessions[session_id] = GameSession(now=now, **{**self.session_kwargs, **options})
+                        if kind == "hello":
+                            continue
+
+                    events = self.tick(session, message, now)
+                except (ValueError, TypeError):
+                    self.errors += 1
+                    continue
+                self.messages += 1
+
+                if events:
+                    self.events += len(events)
+                    writer.write(json.dumps({"seq": message.get("seq"), "events": events}).encode() + b"\n")
+                    await writer.drain()  # Slow readers hold up only their own session
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.sessions.pop(session_id, None)
+            writer.close()
+
+    @staticmethod
+    def session_options(hello):
+        """GameSession options from a hello; raises ValueError or TypeError for a missing or out of range value."""
+        options = {}
+        for key in SESSION_OPTIONS:
+            if key not in hello:
+                continue
+            value, (low, high) = hello[key], OPTION_RANGES[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise TypeError(f"{key} must be a number")
+            if not np.isfinite(value) or not low <= value <= high:
+                raise ValueError(f"{key} {value} outside {low}..{high}")
+            if key in ("players", "limit") and value != int(value):
+                raise ValueError(f"{key} must be a whole number")
+            options[key] = int(value) if key in ("players", "limit") else float(value)
+        return options
+
+    @staticmethod
+    def tick(session, message, now):
+        """Advance session by one client frame; raises ValueError or TypeError for malformed fields."""
+        if not np.isfinite(now) or now < session.start_time:
+            raise ValueError(f"frame time {now} before the start of the round")
+        if "landmarks" in message:
+            landmarks = np.asarray(message["landmarks"], dtype=np.float32)
+            if landmarks.size and (landmarks.ndim not in (2, 3) or landmarks.shape[-2:] != (21, 2)):
+                raise ValueError(f"landmarks of shape {landmarks.shape}, expected (hands, 21, 2)")
+            handedness = message.get("handedness", [])
+            if not isinstance(handedness, (list, tuple)) or not all(isinstance(label, str) for label in handedness):
+                raise TypeError("handedness must be a list of labels")
+            return session.tick_landmarks(landmarks.reshape(-1, 21, 2), now, handedness, float(message.get("width", 1)))
+
+        gestures = message.get("gestures", ())
+        if not isinstance(gestures, (list, tuple)) or not all(isinstance(gesture, str) for gesture in gestures):
+            raise TypeError("gestures must be a list of gesture names")
+        return session.tick(list(gestures[:session.players]) + ["Unknown"] * (session.players - len(gestures)), now)
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "total_sessions": self.total_sessions,
+            "messages": self.messages,
+            "events": self.events,
+            "errors": self.errors,
+            "uptime": time.perf_counter() - self.started,
+            "cpu_seconds": time.process_time() - self.cpu_started,
+        }
+
+
+def _serve(host, port):
+    asyncio.run(GameServer(host, port).serve_forever())
+
+
+def _script_frames(mode, fps, rng):
+    """One round of client input as pre-encoded message templates: wait out the countdown, show a move, restart."""
+    moves = ("rock", "paper", "scissors")
+    gestures = ["Unknown"] * int(3.2 * fps) + [moves[rng.integers(3)]] * 10 + ["Restart"] * 8
+    if mode == "gestures":
+        payloads = {g: json.dumps({"gestures": [g]})[:-1] for g in set(gestures)}
+    else:
+        from benchmarks import synthetic_hands
+        payloads = {}
+        for g in set(gestures):
+            hands = synthetic_hands([g], rng).round(1).tolist() if g != "Unknown" else []
+            payloads[g] = json.dumps({"landmarks": hands, "handedness": ["Right"] * len(hands), "width": 1280})[:-1]
+    return [payloads[g] for g in gestures]
+
+
+async def _client(host, port, script, fps, deadline, results):
+    for _ in range(100):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    else:
+        raise ConnectionError(f"Could not connect to {host}:{port}")
+
+    sent_at = {}
+    latencies, counts = results["latencies"], results["events"]
+
+    async def read_events():
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            reply = json.loads(line)
+            start = sent_at.pop(reply["seq"], None)
+            if start is not None:
+                latencies.append(time.perf_counter() - start)
+            for event in reply["events"]:
+                counts[event["type"]] = counts.get(event["type"], 0) + 1
+
+    reading = asyncio.create_task(read_events())
+    loop = asyncio.get_running_loop()
+    start, seq = loop.time(), 0
+    while loop.time() < deadline:
+        frame = script[seq % len(script)]
+        sent_at[seq] = time.perf_counter()
+        writer.write(f'{frame}, "t": {seq / fps}, "seq": {seq}}}\n'.encode())
+        seq += 1
+        if len(sent_at) > fps:  # Frames that produced no events
+            sent_at.pop(next(iter(sent_at)))
+        await writer.drain()
+        await asyncio.sleep(max(0.0, start + seq / fps - loop.time()))
+    results["sent"] += seq
+    writer.close()
+    reading.cancel()
+
+
+async def _query_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"type": "stats"}\n')
+    await writer.drain()
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def load_test(host, port, sessions=200, seconds=10.0, fps=30.0, mode="gestures"):
+    """Drive sessions concurrent clients at fps against a server and estimate how many sessions one core can host."""
+    rng = np.random.default_rng(0)
+    scripts = [_script_frames(mode, fps, rng) for _ in range(min(sessions, 16))]
+    results = {"sent": 0, "latencies": [], "events": {}}
+
+    loop = asyncio.get_running_loop()
+    await _client(host, port, scripts[0], fps, loop.time(), results)  # Wait for the server to come up
+    before = await _query_stats(host, port)
+    deadline = loop.time() + seconds
+    await asyncio.gather(*(_client(host, port, scripts[i % len(scripts)], fps, deadline, results) for i in range(sessions)))
+    await asyncio.sleep(0.2)
+    after = await _query_stats(host, port)
+
+    messages = after["messages"] - before["messages"]
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    cpu_per_message = cpu / max(messages, 1)
+    latencies = np.array(results["latencies"] or [0.0]) * 1000
+    return {
+        "sessions": sessions,
+        "mode": mode,
+        "offered_fps": sessions * fps,
+        "processed_per_second": messages / seconds,
+        "server_cpu_utilisation": cpu / seconds,
+        "cpu_us_per_message": cpu_per_message * 1e6,
+        "sessions_per_core": 1 / (cpu_per_message * fps) if cpu_per_message else float("inf"),
+        "event_latency_p50_ms": float(np.percentile(latencies, 50)),
+        "event_latency_p95_ms": float(np.percentile(latencies, 95)),
+        "events": results["events"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Rock-Paper-Scissors game sessions over a local socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--load-test", action="store_true", help="Start a server process and drive it with simulated clients")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--mode", choices=("gestures", "landmarks"), default="gestures")
+    args = parser.parse_args(argv)
+
+    if not args.load_test:
+        asyncio.run(GameServer(args.host, args.port, args.unix).serve_forever())
+        return 0
+
+    # The server gets its own process (and core) so its CPU time excludes the clients
+    server = multiprocessing.get_context("spawn").Process(target=_serve, args=(args.host, args.port), daemon=True)
+    server.start()
+    try:
+        results = asyncio.run(load_test(args.host, args.port, args.sessions, args.seconds, args.fps, args.mode))
+    finally:
+        server.terminate()
+    print(json.dumps(results, indent=2))
+    print(f"{os.cpu_count()} cores here; one server process per core hosts about {results['sessions_per_core']:.0f} sessions at {args.fps:g} fps.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
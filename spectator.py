@@ -0,0 +1,541 @@
+"""
+Local spectator server.
+
+Runs an asyncio HTTP/WebSocket server on a background thread of the game
+process. Spectators get the composed game view as an MJPEG stream and the game
+state (scores, moves, locked gestures) as compact JSON deltas over a WebSocket.
+
+The game thread only copies a downscaled frame into a free ring slot (when
+anyone is watching, at most fps times a second) and posts state changes. An
+encoder thread compresses each frame once per quality level in use, and the
+same bytes are fanned out to every viewer of that quality. Every viewer holds
+only the newest frame: one that is too slow to take frames as fast as they
+come skips the ones in between, so it never holds up the game or other viewers.
+
+    GET /                    viewer page
+    GET /stream.mjpg?q=low   multipart/x-mixed-replace JPEG stream (q: high or low)
+    GET /ws                  WebSocket: a full state snapshot, then deltas
+    GET /state, /stats       JSON
+
+    python spectator.py --port 8088                       (synthetic game)
+    python spectator.py --load-test --clients 200 --seconds 10
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import cv2
+from camera import FrameRing
+
+QUALITIES = {"high": 80, "low": 50}
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+BOUNDARY = b"frame"
+MAX_PENDING_DELTAS = 32  # A WebSocket viewer further behind than this gets a fresh snapshot instead
+
+PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="UTF-8"><title>Rock-Paper-Scissors Shoot!</title>
+<style>body{font-family:Arial,sans-serif;text-align:center;background:#111;color:#eee}img{max-width:100%}</style></head>
+<body><img id="view" src="/stream.mjpg?q=high"><h2 id="headline"></h2><p id="state"></p>
+<script>
+const state = {};
+const socket = new WebSocket(`ws://${location.host}/ws`);
+socket.onmessage = (message) => {
+  Object.assign(state, JSON.parse(message.data));
+  document.getElementById("headline").textContent = state.headline || "";
+  document.getElementById("state").textContent =
+    `Score ${state.scores[0]} : ${state.scores[1]} | ${(state.choices || []).filter(Boolean).join(" vs ")}` +
+    ` | locked: ${(state.locked || []).map((g) => g || "-").join(", ")}`;
+};
+</script></body></html>"""
+
+
+def ws_frame(payload, opcode=0x1):
+    """A single unmasked server-to-client WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def ws_read(reader):
+    """Read one (masked) client frame and return (opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = (np.frombuffer(payload, np.uint8) ^ np.resize(np.frombuffer(mask, np.uint8), length)).tobytes()
+    return first & 0x0F, payload
+
+
+class Viewer:
+    """One connected spectator: the newest frame or the deltas it has not been sent yet."""
+
+    def __init__(self, kind, quality=None):
+        self.kind = kind
+        self.quality = quality
+        self.frame = None
+        self.deltas = collections.deque()
+        self.resync = False
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+
+class SpectatorServer:
+    """
+    Spectator endpoint for the game loop. Call publish_state() every frame
+    and publish_frame() when wants_frame() is true; neither waits for the
+    network or the encoder.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8088, fps=15.0, size=(640, 360), qualities=None):
+        self.host = host
+        self.port = port
+        self.interval = 1 / fps
+        self.size = size
+        self.qualities = qualities or QUALITIES
+        self.ring = FrameRing(3)
+        self.frame_id = 0
+        self.next_frame = 0.0
+        self.state = {}
+        self.streams = {quality: set() for quality in self.qualities}
+        self.sockets = set()
+        self.loop = None
+        self.server = None
+        self.running = False
+        self.threads = []
+
+        # Counters
+        self.frames_published = 0
+        self.publish_time = 0.0
+        self.frames_encoded = dict.fromkeys(self.qualities, 0)
+        self.encode_time = 0.0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.deltas_sent = 0
+        self.resyncs = 0
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    def start(self):
+        """Bind and start serving on a background thread; raises OSError if the port is taken."""
+        if self.running:
+            return self
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.running = True
+        self.threads = [threading.Thread(target=self.loop.run_forever, name="spectator-server", daemon=True),
+                        threading.Thread(target=self._encoder, name="spectator-encoder", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    # Game thread side
+
+    @property
+    def viewers(self):
+        return sum(len(viewers) for viewers in self.streams.values())
+
+    def wants_frame(self, now=None):
+        """Whether a frame is due: someone is watching and the last one was at least 1/fps ago."""
+        return self.viewers > 0 and (time.perf_counter() if now is None else now) >= self.next_frame
+
+    def publish_frame(self, fill, *args):
+        """
+        Hand a frame to the encoder. fill(*args, out=buffer) writes the view as
+        an (height, width, 3 or 4) BGR(A) array into buffer (None the first
+        time a ring slot is used) and returns it.
+        """
+        start = time.perf_counter()
+        self.next_frame = max(self.next_frame + self.interval, start - self.interval)
+        index = self.ring.write_slot()
+        frame = fill(*args, out=self.ring.buffer(index))
+        self.frame_id += 1
+        self.ring.commit(index, frame, self.frame_id, start)
+        self.frames_published += 1
+        self.publish_time += time.perf_counter() - start
+
+    def publish_state(self, state):
+        """Post the fields of state that changed since the last call to the WebSocket viewers."""
+        if self.sockets:
+            delta = {key: value for key, value in state.items() if self.state.get(key) != value}
+            if delta:
+                self.loop.call_soon_threadsafe(self._send_delta, delta)
+        self.state = state
+
+    # Encoder thread
+
+    def _encoder(self):
+        last_id, bgr = 0, None
+        while self.running:
+            frame_id, _, frame = self.ring.newest(last_id, timeout=0.5)
+            if frame is None:
+                continue
+            last_id = frame_id
+            start = time.thread_time()  # CPU time: the thread also waits for the GIL
+            if frame.shape[2] == 4:
+                bgr = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=bgr if bgr is not None and bgr.shape[:2] == frame.shape[:2] else None)
+                frame = bgr
+            for quality, level in self.qualities.items():
+                if not self.streams[quality]:
+                    continue
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, level])
+                if not ok:
+                    continue
+                # Encoded once; every viewer of this quality is sent the same bytes
+                chunk = b"--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%s\r\n" % (
+                    BOUNDARY, len(jpeg), jpeg.tobytes())
+                self.frames_encoded[quality] += 1
+                self.loop.call_soon_threadsafe(self._send_frame, quality, chunk)
+            self.encode_time += time.thread_time() - start
+
+    # Event loop thread
+
+    def _send_frame(self, quality, chunk):
+        for viewer in self.streams[quality]:
+            if viewer.frame is not None:
+                viewer.dropped += 1  # Replaced before the viewer took it
+                self.frames_dropped += 1
+            viewer.frame = chunk
+            viewer.ready.set()
+
+    def _send_delta(self, delta):
+        message = ws_frame(json.dumps(delta, separators=(",", ":")).encode())
+        for viewer in self.sockets:
+            if len(viewer.deltas) >= MAX_PENDING_DELTAS:
+                viewer.deltas.clear()
+                viewer.resync = True
+            elif not viewer.resync:
+                viewer.deltas.append(message)
+            viewer.ready.set()
+
+    def _snapshot(self):
+        return ws_frame(json.dumps(self.state, separators=(",", ":")).encode())
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {key.strip().lower(): value.strip() for key, _, value in (line.partition(":") for line in lines[1:] if line)}
+            url = urlsplit(target)
+            if method != "GET":
+                await self._respond(writer, 405, b"Method Not Allowed", "text/plain")
+            elif url.path == "/":
+                await self._respond(writer, 200, PAGE, "text/html; charset=utf-8")
+            elif url.path == "/state":
+                await self._respond(writer, 200, json.dumps(self.state).encode(), "application/json")
+            elif url.path == "/stats":
+                await self._respond(writer, 200, json.dumps(self.stats()).encode(), "application/json")
+            elif url.path == "/stream.mjpg":
+                quality = parse_qs(url.query).get("q", ["high"])[0]
+                await self._stream(writer, quality if quality in self.qualities else next(iter(self.qualities)))
+            elif url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._websocket(reader, writer, headers["sec-websocket-key"])
+            else:
+                await self._respond(writer, 404, b"Not Found", "text/plain")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, KeyError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, body, content_type):
+        writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (
+            status, {200: b"OK", 404: b"Not Found", 405: b"Method Not Allowed"}[status], content_type.encode(), len(body)))
+        writer.write(body)
+        await writer.drain()
+
+    async def _stream(self, writer, quality):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=%s\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n" % BOUNDARY)
+        # Keep little in the socket buffers so a slow viewer skips frames instead of lagging behind
+        writer.transport.set_write_buffer_limits(high=32 * 1024)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+        viewer = Viewer("stream", quality)
+        self.streams[quality].add(viewer)
+        try:
+            while not writer.is_closing():
+                await viewer.ready.wait()
+                viewer.ready.clear()
+                chunk, viewer.frame = viewer.frame, None
+                if chunk is None:
+                    continue
+                writer.write(chunk)
+                await writer.drain()
+                viewer.sent += 1
+                self.frames_sent += 1
+                self.bytes_sent += len(chunk)
+        finally:
+            self.streams[quality].discard(viewer)
+
+    async def _websocket(self, reader, writer, key):
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: %s\r\n\r\n" % accept)
+        viewer = Viewer("socket")
+        viewer.resync = True  # Starts with a snapshot
+        viewer.ready.set()
+        self.sockets.add(viewer)
+        listening = asyncio.create_task(self._ws_listen(reader, writer, viewer))
+        try:
+            while not listening.done():
+                await viewer.ready.wait()
+                viewer.ready.clear()
+                if viewer.resync:
+                    viewer.resync = False
+                    self.resyncs += 1
+                    writer.write(self._snapshot())
+                while viewer.deltas:
+                    message = viewer.deltas.popleft()
+                    writer.write(message)
+                    self.deltas_sent += 1
+                    self.bytes_sent += len(message)
+                await writer.drain()
+        finally:
+            self.sockets.discard(viewer)
+            listening.cancel()
+
+    async def _ws_listen(self, reader, writer, viewer):
+        """Answer pings and return when the viewer closes the socket or goes away."""
+        try:
+            while True:
+                opcode, payload = await ws_read(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            viewer.ready.set()  # Wake the sender so it sees the socket is done
+
+    def stats(self):
+        return {
+            "stream_viewers": {quality: len(viewers) for quality, viewers in self.streams.items()},
+            "socket_viewers": len(self.sockets),
+            "frames_published": self.frames_published,
+            "publish_ms": self.publish_time / max(self.frames_published, 1) * 1000,
+            "frames_encoded": dict(self.frames_encoded),
+            "encode_cpu_seconds": self.encode_time,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "deltas_sent": self.deltas_sent,
+            "resyncs": self.resyncs,
+            "bytes_sent": self.bytes_sent,
+            "uptime": time.perf_counter() - self.started,
+            "cpu_seconds": time.process_time() - self.cpu_started,
+        }
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
+
+
+class SyntheticGame:
+    """Stand-in for the game loop: a moving test picture and a changing state at fps, for the demo and the load test."""
+
+    def __init__(self, server, fps=30.0):
+        self.server = server
+        self.fps = fps
+        width, height = server.size
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        self.picture = np.dstack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                                  np.full((height, width), 96, np.float32), np.zeros((height, width), np.float32)])
+        self.picture = self.picture.astype(np.uint8)
+        self.frames = 0
+        self.late = 0  # Frames that started after their slot: the game loop was held up
+        self.thread = threading.Thread(target=self.run, name="synthetic-game", daemon=True)
+
+    def fill(self, out=None):
+        if out is None:
+            out = np.empty_like(self.picture)
+        np.copyto(out, self.picture)
+        cv2.putText(out, f"frame {self.frames}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255, 0), 3)
+        cv2.circle(out, (int(320 + 250 * np.sin(self.frames / 20)), 200), 40, (0, 0, 255, 0), -1)
+        return out
+
+    def run(self):
+        moves = ("rock", "paper", "scissors")
+        start = time.perf_counter()
+        while self.server.running:
+            self.frames += 1
+            round_frame = self.frames % 150
+            self.server.publish_state({
+                "phase": "countdown" if round_frame < 90 else "result",
+                "headline": ("Rock", "Paper", "Scissors")[round_frame // 30] if round_frame < 90 else "VS",
+                "scores": [self.frames // 300, self.frames // 450],
+                "choices": [moves[self.frames // 150 % 3], moves[self.frames // 300 % 3]] if round_frame >= 90 else [None, None],
+                "locked": [moves[self.frames // 150 % 3] if round_frame >= 80 else None],
+            })
+            if self.server.wants_frame():
+                self.server.publish_frame(self.fill)
+            delay = start + self.frames / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late += 1
+
+
+def _serve(host, port, fps):
+    server = SpectatorServer(host, port, fps=fps).start()
+    SyntheticGame(server).run()
+
+
+async def _stream_client(host, port, quality, deadline, results, slow=False):
+    for _ in range(100):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    else:
+        raise ConnectionError(f"Could not connect to {host}:{port}")
+    writer.write(b"GET /stream.mjpg?q=%s HTTP/1.1\r\nHost: spectator\r\n\r\n" % quality.encode())
+    await reader.readuntil(b"\r\n\r\n")
+    loop = asyncio.get_running_loop()
+    frames = 0
+    try:
+        while loop.time() < deadline:
+            headers = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), max(0.01, deadline - loop.time()))
+            length = int(headers.rsplit(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+            await reader.readexactly(length + 2)
+            frames += 1
+            if slow:
+                await asyncio.sleep(0.5)  # A viewer on a bad link
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+    results["slow" if slow else "fast"].append(frames)
+
+
+async def _socket_client(host, port, deadline, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /ws HTTP/1.1\r\nHost: spectator\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n")
+    await reader.readuntil(b"\r\n\r\n")
+    loop = asyncio.get_running_loop()
+    state, messages = {}, 0
+    try:
+        while loop.time() < deadline:
+            _, payload = await asyncio.wait_for(ws_read(reader), max(0.01, deadline - loop.time()))
+            state.update(json.loads(payload))
+            messages += 1
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+    results["messages"].append(messages)
+    results["states"].append(state)
+
+
+async def _get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET %s HTTP/1.1\r\nHost: spectator\r\n\r\n" % path.encode())
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def load_test(host, port, clients=100, seconds=10.0, fps=15.0, slow=0.1, sockets=1.0):
+    """
+    Connect clients MJPEG viewers (half per quality, a fraction slow of them
+    reading only twice a second) plus sockets * clients WebSocket viewers to a
+    server, and estimate how many viewers one core can serve.
+    """
+    results = {"fast": [], "slow": [], "messages": [], "states": []}
+    loop = asyncio.get_running_loop()
+    await _stream_client(host, port, "low", loop.time() + 0.5, {"fast": [], "slow": []})  # Wait for the server
+    before = await _get_json(host, port, "/stats")
+    deadline = loop.time() + seconds
+    qualities = list(QUALITIES)
+    slow_clients = int(clients * slow)
+    await asyncio.gather(
+        *(_stream_client(host, port, qualities[i % len(qualities)], deadline, results, i < slow_clients) for i in range(clients)),
+        *(_socket_client(host, port, deadline, results) for _ in range(int(clients * sockets))))
+    after = await _get_json(host, port, "/stats")
+
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    encode = after["encode_cpu_seconds"] - before["encode_cpu_seconds"]
+    published = after["frames_published"] - before["frames_published"]
+    fast = np.array(results["fast"] or [0]) / seconds
+    # Encoding is paid once per frame whatever the audience; the rest grows with the number of viewers
+    per_viewer = max(cpu - encode, 1e-9) / seconds / clients
+    return {
+        "clients": clients,
+        "slow_clients": slow_clients,
+        "socket_clients": len(results["messages"]),
+        "published_fps": published / seconds,
+        "viewer_fps_mean": float(fast.mean()),
+        "viewer_fps_p5": float(np.percentile(fast, 5)),
+        "slow_viewer_fps_mean": float(np.mean(results["slow"]) / seconds) if results["slow"] else None,
+        "deltas_per_socket_per_second": float(np.mean(results["messages"] or [0]) / seconds),
+        "frames_dropped": after["frames_dropped"] - before["frames_dropped"],
+        "server_cpu_utilisation": cpu / seconds,
+        "encode_utilisation": encode / seconds,
+        "mbit_per_second": (after["bytes_sent"] - before["bytes_sent"]) * 8 / seconds / 1e6,
+        "clients_per_core": (1 - encode / seconds) / per_viewer,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the game view and state to local spectators.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--fps", type=float, default=15.0, help="Frames per second sent to viewers")
+    parser.add_argument("--load-test", action="store_true", help="Start a server process with a synthetic game and drive it with simulated viewers")
+    parser.add_argument("--clients", type=int, default=100, help="MJPEG viewers; as many WebSocket viewers connect too")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--slow", type=float, default=0.1, help="Fraction of MJPEG viewers that read only twice a second")
+    args = parser.parse_args(argv)
+
+    if not args.load_test:
+        print(f"Serving a synthetic game on http://{args.host}:{args.port}/")
+        _serve(args.host, args.port, args.fps)
+        return 0
+
+    # The server gets its own process (and core) so its CPU time excludes the clients
+    server = multiprocessing.get_context("spawn").Process(target=_serve, args=(args.host, args.port, args.fps), daemon=True)
+    server.start()
+    try:
+        results = asyncio.run(load_test(args.host, args.port, args.clients, args.seconds, args.fps, args.slow))
+    finally:
+        server.terminate()
+    print(json.dumps(results, indent=2))
+    print(f"{os.cpu_count()} cores here; one server core serves about {results['clients_per_core']:.0f} viewers "
+          f"at {args.fps:g} fps.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Startup:
+    """
+    Runs the slow start-up steps (camera, asset decoding, detector warm-up) on
+    background threads while the home screen is already showing, and logs how
+    long each took, the time to the first frame and the time until all of them
+    are done.
+
+    Times are measured from started, a time.perf_counter() value taken as early
+    as possible in the process.
+    """
+
+    def __init__(self, started=None, workers=4, log=print):
+        self.started = time.perf_counter() if started is None else started
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="startup")
+        self.log = log
+        self.tasks = {}
+        self.durations = {}
+        self.marks = {}
+        self.sealed = False
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def submit(self, name, fn, *args, **kwargs):
+        def run():
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.durations[name] = time.perf_counter() - start
+                self.log(f"Startup: {name} took {self.durations[name] * 1000:.0f} ms")
+                self._check_ready()
+
+        with self.lock:
+            if self.sealed:
+                raise RuntimeError(f"Startup task {name} submitted after seal()")
+            self.tasks[name] = self.pool.submit(run)
+            return self.tasks[name]
+
+    def seal(self):
+        """Declare that every task has been submitted, so "ready" can be marked once they finish."""
+        with self.lock:
+            self.sealed = True
+        self._check_ready()
+
+    def _check_ready(self):
+        # Called from inside each task, before its future counts as done, so finished durations are counted.
+        # Until seal() more tasks may follow, so an early task finishing first is not "ready"
+        with self.lock:
+            done = self.sealed and len(self.durations) == len(self.tasks)
+        if done:
+            self.mark("ready")
+
+    def ready(self, *names):
+        """Whether the named tasks (default: all) have finished."""
+        return all(self.tasks[name].done() for name in names or self.tasks)
+
+    def result(self, name, timeout=None):
+        """The value of a finished task, waiting for it if needed; re-raises its exception."""
+        return self.tasks[name].result(timeout)
+
+    def mark(self, name):
+        """Record (and log) the first time a milestone such as "first_frame" is reached."""
+        with self.lock:
+            if name in self.marks:
+                return
+            self.marks[name] = self.elapsed()
+        self.log(f"Startup: time to {name.replace('_', ' ')} {self.marks[name] * 1000:.0f} ms")
+
+    def summary(self):
+        return {
+            "marks_ms": {name: t * 1000 for name, t in self.marks.items()},
+            "tasks_ms": {name: t * 1000 for name, t in self.durations.items()},
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
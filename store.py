@@ -0,0 +1,361 @@
+"""
+Persistent round history and leaderboards.
+
+Every finished round (time, both moves, winner, time to lock) is kept in a
+SQLite database in WAL mode, together with one row per game session. The frame
+loop only appends to an in-memory queue; a background thread writes the queue
+in batches, one transaction each, and keeps per-kiosk totals up to date in the
+same transaction, so summaries and top-N queries never scan the round history.
+
+    python store.py scores.db --top 10
+    python store.py /tmp/bench.db --bench 5000
+"""
+import argparse
+import collections
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import numpy as np
+import utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kiosk TEXT NOT NULL,
+    players INTEGER NOT NULL,
+    bot TEXT,
+    started REAL NOT NULL,
+    ended REAL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    player_score INTEGER NOT NULL DEFAULT 0,
+    opponent_score INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (player_score DESC, rounds);
+CREATE INDEX IF NOT EXISTS sessions_by_kiosk_score ON sessions (kiosk, player_score DESC, rounds);
+
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    time REAL NOT NULL,
+    player_move INTEGER,
+    opponent_move INTEGER,
+    winner INTEGER NOT NULL,
+    time_to_lock REAL
+);
+CREATE INDEX IF NOT EXISTS rounds_by_session ON rounds (session_id);
+
+CREATE TABLE IF NOT EXISTS kiosk_stats (
+    kiosk TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    player_wins INTEGER NOT NULL DEFAULT 0,
+    opponent_wins INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    rock INTEGER NOT NULL DEFAULT 0,
+    paper INTEGER NOT NULL DEFAULT 0,
+    scissors INTEGER NOT NULL DEFAULT 0,
+    lock_time_total REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Moves and winners are stored as utils.MOVES and utils.WINNERS indexes
+KIOSK_COLUMNS = ("sessions", "rounds", "player_wins", "opponent_wins", "draws", "rock", "paper", "scissors",
+                 "lock_time_total")
+
+
+class ScoreStore:
+    """
+    Round history and leaderboards of one kiosk (RPS_KIOSK, the host name by
+    default) in a SQLite database owned by this process.
+
+    start_session(), record_round() and end_session() only queue the write and
+    never touch the disk. start_session() returns a handle for the session; the
+    writer thread inserts it, SQLite assigns its id and session_id() maps the
+    handle to that id once written, so several processes can share a database.
+    The writer commits the queue every flush_interval seconds or once batch_size
+    writes are waiting. Queries run on their own connection per thread and, in
+    WAL mode, do not wait for the writer.
+    """
+
+    def __init__(self, path="scores.db", kiosk=None, batch_size=512, flush_interval=1.0):
+        self.path = path
+        self.kiosk = kiosk or os.environ.get("RPS_KIOSK") or socket.gethostname()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.local = threading.local()
+        self.next_handle = 0
+        self.session_ids = {}  # Session handle: database id, filled in by the writer
+        self.running = False
+        self.thread = None
+
+        # Counters
+        self.queued = 0
+        self.written = 0
+        self.processed = 0  # Written or lost to an error
+        self.batches = 0
+        self.write_time = 0.0
+        self.errors = 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints: a power cut may lose the last batches but never corrupts
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def start(self):
+        """Create the schema and start the writer thread; call before the first session."""
+        if self.running:
+            return self
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, name="score-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def _queue(self, item):
+        with self.cond:
+            self.pending.append(item)
+            self.queued += 1
+            if len(self.pending) >= self.batch_size:
+                self.cond.notify_all()
+
+    def start_session(self, players=1, bot=None, now=None):
+        """Queue a new session and return its handle for record_round() and end_session()."""
+        with self.cond:
+            handle = self.next_handle
+            self.next_handle += 1
+        self._queue(("session", handle, players, bot, time.time() if now is None else now))
+        return handle
+
+    def session_id(self, handle, timeout=5.0):
+        """The database id of a session, waiting for the writer if it has not been inserted yet."""
+        if handle not in self.session_ids:
+            self.flush(timeout)
+        return self.session_ids.get(handle)
+
+    def record_round(self, handle, event, now=None):
+        """Queue a GameSession result event."""
+        player, opponent = event["choices"]
+        self._queue(("round", handle, time.time() if now is None else now, utils.MOVE_INDEX.get(player),
+                     utils.MOVE_INDEX.get(opponent), utils.WINNERS.index(event["winner"]), event.get("time_to_lock"),
+                     event["scores"]))
+
+    def end_session(self, handle, now=None):
+        self._queue(("end", handle, time.time() if now is None else now))
+
+    def _writer(self):
+        db = self._connect()
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: not self.running or len(self.pending) >= self.batch_size,
+                                   timeout=self.flush_interval)
+                batch = list(self.pending)
+                self.pending.clear()
+                running = self.running
+            if batch:
+                start = time.perf_counter()
+                try:
+                    self._write(db, batch)
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    # A failed batch is dropped rather than retried forever; the game goes on either way
+                    print(f"Could not save scores: {e}")
+                    self.errors += 1
+                self.batches += 1
+                self.write_time += time.perf_counter() - start
+                with self.cond:
+                    self.processed += len(batch)
+                    self.cond.notify_all()  # Wake flush()
+            if not running:
+                db.close()
+                return
+
+    def _write(self, db, batch):
+        rounds, ended = [], []
+        scores = {}  # Session id: [rounds in this batch, newest scores]
+        totals = dict.fromkeys(KIOSK_COLUMNS, 0)
+        inserted = {}  # Handles of the sessions inserted by this batch, published once it commits
+        with db:
+            for item in batch:
+                if item[0] == "session":
+                    # One insert per session, for the id SQLite assigns it
+                    inserted[item[1]] = db.execute("INSERT INTO sessions (kiosk, players, bot, started) VALUES (?, ?, ?, ?)",
+                                                   (self.kiosk,) + item[2:]).lastrowid
+                    totals["sessions"] += 1
+                    continue
+                session_id = inserted.get(item[1], self.session_ids.get(item[1]))
+                if session_id is None:
+                    continue  # Its session was in a batch that failed
+                if item[0] == "round":
+                    _, _, t, player, opponent, winner, time_to_lock, round_scores = item
+                    rounds.append((session_id, t, player, opponent, winner, time_to_lock))
+                    session = scores.setdefault(session_id, [0, None])
+                    session[0] += 1
+                    session[1] = round_scores
+                    totals["rounds"] += 1
+                    totals[("draws", "player_wins", "opponent_wins")[winner]] += 1
+                    if player is not None:
+                        totals[utils.MOVES[player]] += 1
+                    totals["lock_time_total"] += time_to_lock or 0.0
+                else:
+                    ended.append((item[2], session_id))
+
+            db.executemany("INSERT INTO rounds (session_id, time, player_move, opponent_move, winner, time_to_lock) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rounds)
+            db.executemany("UPDATE sessions SET rounds = rounds + ?, player_score = ?, opponent_score = ? WHERE id = ?",
+                           [(count, s[0], s[1], session_id) for session_id, (count, s) in scores.items()])
+            db.executemany("UPDATE sessions SET ended = ? WHERE id = ?", ended)
+            db.execute(f"INSERT INTO kiosk_stats (kiosk, {', '.join(KIOSK_COLUMNS)}) "
+                       f"VALUES (?{', ?' * len(KIOSK_COLUMNS)}) ON CONFLICT (kiosk) DO UPDATE SET "
+                       + ", ".join(f"{c} = {c} + excluded.{c}" for c in KIOSK_COLUMNS),
+                       (self.kiosk, *totals.values()))
+        self.session_ids.update(inserted)
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written."""
+        target = self.queued
+        with self.cond:
+            self.cond.notify_all()
+            return self.cond.wait_for(lambda: self.processed >= target, timeout)
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "written": self.written,
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "errors": self.errors,
+            "write_ms_per_batch": self.write_time / max(self.batches, 1) * 1000,
+        }
+
+    def close(self):
+        """Write what is still queued and stop the writer."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=10.0)
+            self.thread = None
+
+    # Queries
+
+    def _reader(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = self._connect()
+            db.row_factory = sqlite3.Row
+        return db
+
+    def leaderboard(self, n=10, kiosk=None):
+        """The n sessions with the most wins (fewest rounds first on ties), from all kiosks or one."""
+        where, args = ("WHERE kiosk = ?", (kiosk,)) if kiosk else ("", ())
+        rows = self._reader().execute(
+            f"SELECT id, kiosk, bot, started, rounds, player_score, opponent_score FROM sessions {where} "
+            "ORDER BY player_score DESC, rounds LIMIT ?", (*args, n))
+        return [dict(row) for row in rows]
+
+    def summary(self, kiosk=None):
+        """Totals of one kiosk or of all of them, with win rates, move shares and the mean time to lock."""
+        where, args = ("WHERE kiosk = ?", (kiosk,)) if kiosk else ("", ())
+        row = self._reader().execute(
+            f"SELECT {', '.join(f'total({c}) AS {c}' for c in KIOSK_COLUMNS)} FROM kiosk_stats {where}", args).fetchone()
+        totals = {c: row[c] for c in KIOSK_COLUMNS}
+        rounds = max(totals["rounds"], 1)
+        return {
+            **{c: int(v) for c, v in totals.items() if c != "lock_time_total"},
+            "player_win_rate": totals["player_wins"] / rounds,
+            "opponent_win_rate": totals["opponent_wins"] / rounds,
+            "moves": {move: totals[move] / rounds for move in utils.MOVES},
+            "mean_time_to_lock": totals["lock_time_total"] / rounds,
+        }
+
+    def history(self, session_id):
+        """The rounds of one session in order, with moves and winners as names."""
+        rows = self._reader().execute(
+            "SELECT time, player_move, opponent_move, winner, time_to_lock FROM rounds WHERE session_id = ? ORDER BY id",
+            (session_id,))
+        return [{"time": t, "choices": [utils.MOVES[p] if p is not None else None, utils.MOVES[o] if o is not None else None],
+                 "winner": utils.WINNERS[w], "time_to_lock": lock} for t, p, o, w, lock in rows]
+
+
+def bench(path, sessions=5000, rounds=8, seed=0):
+    """
+    Simulate sessions of rounds each, as fast as possible: how long the game
+    thread spends queueing a round, how fast the writer keeps up and how long
+    the queries take on the resulting database.
+    """
+    rng = np.random.default_rng(seed)
+    store = ScoreStore(path, kiosk=f"bench-{seed}").start()
+    moves = rng.integers(0, 3, (sessions, rounds, 2))
+    locks = rng.gamma(2.0, 0.3, (sessions, rounds))
+    enqueue = []
+    start = time.perf_counter()
+    handles = []
+    for s in range(sessions):
+        session_id = store.start_session(1, "markov", now=start + s)
+        handles.append(session_id)
+        score = [0, 0]
+        for r in range(rounds):
+            player, opponent = moves[s, r]
+            winner = utils.OUTCOMES[player, opponent]
+            if winner:
+                score[winner - 1] += 1
+            event = {"winner": utils.WINNERS[winner], "choices": [utils.MOVES[player], utils.MOVES[opponent]],
+                     "scores": list(score), "time_to_lock": locks[s, r]}
+            t = time.perf_counter()
+            store.record_round(session_id, event, now=start + s + r)
+            enqueue.append(time.perf_counter() - t)
+        store.end_session(session_id, now=start + s + rounds)
+    queued = time.perf_counter() - start
+    store.flush(60.0)
+    elapsed = time.perf_counter() - start
+
+    queries = {}
+    for name, query in (("leaderboard", lambda: store.leaderboard(10)), ("summary", store.summary),
+                        ("history", lambda: store.history(store.session_id(handles[sessions // 2])))):
+        t = time.perf_counter()
+        for _ in range(100):
+            query()
+        queries[f"{name}_ms"] = (time.perf_counter() - t) / 100 * 1000
+    stats = store.stats()
+    store.close()
+    enqueue = np.array(enqueue) * 1e6
+    return {
+        "rounds": sessions * rounds,
+        "enqueue_us_p50": float(np.percentile(enqueue, 50)),
+        "enqueue_us_p99": float(np.percentile(enqueue, 99)),
+        "queue_seconds": queued,
+        "rounds_per_second_written": sessions * rounds / elapsed,
+        **stats,
+        **queries,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show leaderboards and totals from a score database.")
+    parser.add_argument("path", nargs="?", default="scores.db")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--kiosk", help="Only this kiosk")
+    parser.add_argument("--bench", type=int, metavar="SESSIONS", help="Fill the database with simulated sessions and time it")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        print(json.dumps(bench(args.path, args.bench), indent=2))
+        return 0
+    store = ScoreStore(args.path).start()
+    print(json.dumps({"summary": store.summary(args.kiosk), "leaderboard": store.leaderboard(args.top, args.kiosk)},
+                     indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pytest
+from camera import CameraProfiles, CameraStream, SimulatedCamera, VideoFileSource, configure, current_mode
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (160, 120))
+    for i in range(5):
+        writer.write(np.full((120, 160, 3), i * 50, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_video_file_source_loops(video):
+    source = VideoFileSource(video, realtime=False)
+    assert source.isOpened()
+    levels = [int(source.read()[1].mean() + 25) // 50 for _ in range(12)]
+    assert levels == [0, 1, 2, 3, 4] * 2 + [0, 1]
+    source.release()
+
+
+def test_video_file_source_ends_without_loop(video):
+    source = VideoFileSource(video, loop=False, realtime=False)
+    assert all(source.read()[0] for _ in range(5))
+    assert source.read() == (False, None)
+    source.release()
+
+
+def test_camera_stream_delivers_newest_frames(video):
+    stream = CameraStream(VideoFileSource(video, fps=200)).start()
+    try:
+        frames = [stream.read() for _ in range(20)]
+        assert all(ret and frame.shape == (120, 160, 3) for ret, frame in frames)
+        stats = stream.stats()
+        assert stats["delivered"] == 20
+        assert stats["captured"] >= stats["delivered"]
+    finally:
+        stream.release()
+
+
+def test_simulated_camera_snaps_to_supported_modes():
+    cap = SimulatedCamera()
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 700)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 400)
+    mode = current_mode(cap)
+    assert (mode["fourcc"], mode["width"], mode["height"], mode["fps"]) == ("MJPG", 1280, 720, 30)
+    assert not cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"H264"))
+    ret, frame = cap.read()
+    assert ret and frame.shape == (720, 1280, 3)
+    cap.release()
+    assert cap.read() == (False, None)
+
+
+def test_configure_negotiates_once_then_reuses_the_profile(tmp_path):
+    profiles = CameraProfiles(str(tmp_path / "profiles.json"))
+    log = []
+    # The default mode (YUYV 720p) only runs at 10 fps, so a faster one has to be found
+    profile = configure(SimulatedCamera(), "sim", profiles, (640, 360), 30, log=log.append)
+    assert (profile["fourcc"], profile["width"], profile["height"]) == ("MJPG", 640, 360)
+    assert profile["measured_fps"] > 25
+
+    log.clear()
+    cap = SimulatedCamera()
+    again = configure(cap, "sim", CameraProfiles(str(tmp_path / "profiles.json")), (640, 360), 30, log=log.append)
+    assert again == profile
+    assert log and "using saved" in log[0]
+    assert current_mode(cap)["width"] == 640
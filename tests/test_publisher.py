@@ -0,0 +1,91 @@
+import socket
+import time
+import pytest
+from publisher import LocalBroker, MqttPublisher
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker().start()
+    yield broker
+    broker.stop()
+
+
+def test_publish_reaches_broker(broker):
+    publisher = MqttPublisher(broker.host, broker.port, "rps", "test-publish").start()
+    try:
+        publisher.publish([1001], "win")
+        assert wait_for(lambda: broker.messages)
+        assert broker.messages == [("rps", "1001,win")]
+    finally:
+        publisher.stop()
+
+
+def test_messages_queued_while_disconnected_are_all_sent():
+    port = free_port()
+    publisher = MqttPublisher("127.0.0.1", port, "rps", "test-queue", min_backoff=1, max_backoff=1).start()
+    broker = None
+    try:
+        # Repeated round results are distinct events and must not be merged while there is room
+        for _ in range(3):
+            publisher.publish([1001], "win")
+        publisher.publish([2000], "draw")
+        assert publisher.stats()["pending"] == 4
+        broker = LocalBroker(port=port).start()
+        assert wait_for(lambda: len(broker.messages) == 4)
+        assert [payload for _, payload in broker.messages] == ["1001,win"] * 3 + ["2000,draw"]
+        assert publisher.stats()["coalesced"] == 0
+    finally:
+        publisher.stop()
+        if broker is not None:
+            broker.stop()
+
+
+def test_overflow_drops_oldest_and_coalesces_repeats():
+    publisher = MqttPublisher("127.0.0.1", free_port(), "rps", "test-overflow", max_queue=3)
+    for score in range(5):
+        publisher.publish([score], "win")
+    assert list(publisher.pending) == ["2,win", "3,win", "4,win"]
+    assert publisher.dropped == 2
+    publisher.publish([4], "win")
+    assert list(publisher.pending) == ["2,win", "3,win", "4,win"]
+    assert publisher.coalesced == 1
+
+
+def test_reconnects_after_connection_loss(broker):
+    publisher = MqttPublisher(broker.host, broker.port, "rps", "test-reconnect", min_backoff=1, max_backoff=1).start()
+    try:
+        assert wait_for(lambda: publisher.connected)
+        broker.drop_clients()
+        assert wait_for(lambda: publisher.reconnects >= 1)
+        publisher.publish([2000], "draw")
+        assert wait_for(lambda: broker.messages)
+        assert broker.messages == [("rps", "2000,draw")]
+        assert broker.connections == 2
+    finally:
+        publisher.stop()
+
+
+@pytest.mark.parametrize("payload", [b"\x30", b"\x30\x85", b"\x30\x0a\x00\x03rps"])
+def test_broker_treats_short_read_as_disconnect(broker, payload, capfd):
+    with socket.create_connection((broker.host, broker.port)) as sock:
+        sock.sendall(payload)
+    time.sleep(0.2)  # Let the handler thread pick the connection up
+    assert wait_for(lambda: not broker.clients)
+    assert "Traceback" not in capfd.readouterr().err
+    assert broker.messages == []
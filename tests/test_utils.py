@@ -0,0 +1,25 @@
+import random
+import pytest
+import utils
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stabilizer_matches_check_locked_gesture(seed):
+    # The streaming stabilizer replaces the history scan and must lock on the same frames
+    rng = random.Random(seed)
+    for _ in range(100):
+        gestures = [rng.choice(["rock", "rock", "paper"]) for _ in range(rng.randint(1, 40))]
+        stabilizer = utils.GestureStabilizer(limit=5)
+        history = []
+        for gesture in gestures:
+            history.append(gesture)
+            assert stabilizer.update(gesture) == utils.check_locked_gesture(history, limit=5), history
+
+
+def test_stabilizer_first_lock_needs_limit_plus_one_frames():
+    stabilizer = utils.GestureStabilizer(limit=5)
+    assert [stabilizer.update("rock", i) for i in range(6)] == [False] * 5 + ["rock"]
+    # After the first lock a new gesture locks after limit frames, as in the history scan
+    assert [stabilizer.update("paper", 6 + i) for i in range(5)] == [False] * 4 + ["paper"]
+    stabilizer.reset()
+    assert not any(stabilizer.update("rock", i) for i in range(5))
@@ -1,77 +1,236 @@
-import mediapipe as mp
 import numpy as np
-import cv2
+import collections, cv2, time
 
 
 class HandDetector():
-    def __init__(self, mode=False, max_hands=2, complexity = 1, detection_con=0.5, track_con=0.5):
+    """
+    MediaPipe hand detector.
+
+    With tracking enabled, inference runs on a padded square crop around the
+    last landmarks, downscaled to inference_size, and results are mapped back to
+    frame coordinates. A full-frame search runs when tracking is lost, every
+    search_interval frames, and whenever the caller asks for one (search=True,
+    e.g. while a player slot has no hand) so new hands are still picked up.
+
+    With record set to a path, every inferred frame's landmarks, handedness,
+    confidence and timestamp are appended to a recording.LandmarkRecorder file.
+    """
+
+    def __init__(self, mode=False, max_hands=2, complexity = 1, detection_con=0.5, track_con=0.5,
+                 tracking=False, inference_size=256, search_size=None, roi_padding=0.3, search_interval=30, draw=True,
+                 record=None):
         self.mode = mode
         self.max_hands = max_hands
         self.complexity = complexity
         self.detection_con = detection_con
         self.track_con = track_con
+        self.tracking = tracking
+        self.inference_size = inference_size
+        self.search_size = search_size
+        self.roi_padding = roi_padding
+        self.search_interval = search_interval
+        self.draw = draw
+        import mediapipe as mp  # Takes about a second, so only code that builds a detector pays for it
         self.mphand = mp.solutions.hands
         self.hands = self.mphand.Hands(self.mode, self.max_hands, self.complexity,
                                        self.detection_con, self.track_con)
-        self.mpDraw = mp.solutions.drawing_utils
 
-    def find_hands(self, img):
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
-        if self.results.multi_hand_landmarks:
-            for landmark in self.results.multi_hand_landmarks:
-                self.mpDraw.draw_landmarks(img, landmark, self.mphand.HAND_CONNECTIONS)
+        self.results = None
+        self.landmarks = np.empty((0, 21, 2), dtype=np.float32)
+        self.handedness = []
+        self.scores = []
+        self.recorder = None
+        if record:
+            self.start_recording(record)
+
+        # Per-frame inference statistics
+        self.inference_time = 0.0
+        self.avg_inference_time = 0.0
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.roi_frames = 0
+        self.tracking_lost = 0
+        self.since_search = 0
+
+    def find_hands(self, img, infer=True, draw=None, search=False):
+        """
+        Run inference on img, or keep the last landmarks when infer is False (the
+        game state does not need fresh ones). search forces a full-frame search
+        instead of the tracked crop. Landmarks are drawn afterwards if enabled.
+        """
+        if infer:
+            start = time.perf_counter()
+            tracked = self.tracking and not search and self.since_search < self.search_interval
+            roi = self._roi(img.shape) if tracked else None
+            found = False
+            if roi is not None:
+                self.roi_frames += 1
+                found = self._process(img, roi, self.inference_size)
+                if not found:
+                    self.tracking_lost += 1
+            if not found:
+                self.since_search = 0
+                self._process(img, (0, 0, img.shape[1], img.shape[0]), self.search_size)
+            else:
+                self.since_search += 1
+
+            self.inference_time = time.perf_counter() - start
+            self.avg_inference_time += (self.inference_time - self.avg_inference_time) * 0.1
+            self.frames_inferred += 1
+            if self.recorder is not None:
+                self.recorder.append(self.landmarks, self.handedness, self.scores, shape=img.shape, frame_id=self.frames_inferred)
+        else:
+            self.frames_skipped += 1
+
+        if self.draw if draw is None else draw:
+            self.draw_landmarks(img)
         return img
 
+    def _roi(self, shape):
+        """Padded square (x0, y0, x1, y1) around the last landmarks, or None if there are none."""
+        if len(self.landmarks) == 0:
+            return None
+        h, w = shape[:2]
+        mins = self.landmarks.min(axis=(0, 1))
+        maxs = self.landmarks.max(axis=(0, 1))
+        center = (mins + maxs) / 2
+        half = (maxs - mins).max() * (0.5 + self.roi_padding)
+        x0, y0 = max(0, int(center[0] - half)), max(0, int(center[1] - half))
+        x1, y1 = min(w, int(center[0] + half)), min(h, int(center[1] + half))
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return None
+        return x0, y0, x1, y1
+
+    def _process(self, img, roi, size):
+        x0, y0, x1, y1 = roi
+        crop = img[y0:y1, x0:x1]
+        scale = size / max(crop.shape[:2]) if size else 1
+        if scale < 1:
+            crop = cv2.resize(crop, (int(crop.shape[1] * scale), int(crop.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        imgRGB = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        self.results = self.hands.process(imgRGB)
+
+        hands = self.results.multi_hand_landmarks or []
+        landmarks = np.empty((len(hands), 21, 2), dtype=np.float32)
+        for i, hand in enumerate(hands):
+            for id, lm in enumerate(hand.landmark):
+                landmarks[i, id, 0] = lm.x
+                landmarks[i, id, 1] = lm.y
+        # Normalized crop coordinates to frame pixels
+        landmarks *= (x1 - x0, y1 - y0)
+        landmarks += (x0, y0)
+        self.landmarks = landmarks
+        self.handedness = [h.classification[0].label for h in self.results.multi_handedness or []]
+        self.scores = [h.classification[0].score for h in self.results.multi_handedness or []]
+        return len(hands) > 0
+
+    def start_recording(self, path):
+        from recording import LandmarkRecorder
+        self.stop_recording()
+        self.recorder = LandmarkRecorder(path, max_hands=self.max_hands)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def draw_landmarks(self, img, landmarks=None):
+        return draw_landmarks(img, self.landmarks if landmarks is None else landmarks)
+
+    def find_landmarks(self, img=None):
+        """Return the detected hands as a contiguous (hands, 21, 2) float32 array of pixel coordinates."""
+        return self.landmarks
+
     def find_position(self, img, hand_No=0):
-        landmarks = []
-        if self.results.multi_hand_landmarks:
-            myhand = self.results.multi_hand_landmarks[hand_No]
-            for id, lm in enumerate(myhand.landmark):
-                h, w, _ = img.shape
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                landmarks.append([id, cx, cy])
-        return landmarks
+        landmarks = self.find_landmarks(img)
+        if len(landmarks) <= hand_No:
+            return []
+        return [[id, int(x), int(y)] for id, (x, y) in enumerate(landmarks[hand_No])]
+
+    def stats(self):
+        return {
+            "inference_ms": self.inference_time * 1000,
+            "avg_inference_ms": self.avg_inference_time * 1000,
+            "inferred": self.frames_inferred,
+            "skipped": self.frames_skipped,
+            "roi_frames": self.roi_frames,
+            "tracking_lost": self.tracking_lost,
+        }
 
 
-def is_finger_closed(finger_list, wrist):
-    v1 = np.array(finger_list[1]) - np.array(wrist)
-    v2 = np.array(finger_list[3]) - np.array(finger_list[1])
-    cos_theta = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-    return cos_theta < 0
+# mediapipe.solutions.hands.HAND_CONNECTIONS, sorted
+HAND_CONNECTIONS = np.array([
+    (0, 1), (0, 5), (0, 17), (1, 2), (2, 3), (3, 4), (5, 6), (5, 9), (6, 7), (7, 8), (9, 10),
+    (9, 13), (10, 11), (11, 12), (13, 14), (13, 17), (14, 15), (15, 16), (17, 18), (18, 19), (19, 20),
+])
+
+
+def draw_landmarks(img, landmarks):
+    """Draw hand connections and joints for (hands, 21, 2) landmarks in MediaPipe's default style."""
+    for hand in np.asarray(landmarks).astype(np.int32):
+        for a, b in HAND_CONNECTIONS:
+            cv2.line(img, tuple(hand[a]), tuple(hand[b]), (224, 224, 224), 2)
+        for point in hand:
+            cv2.circle(img, tuple(point), 2, (0, 0, 255), -1)
+    return img
+
+
+# Landmark indexes of the middle joint (PIP) and the tip of each finger, index to pinky
+FINGER_PIPS = np.array([6, 10, 14, 18])
+FINGER_TIPS = np.array([8, 12, 16, 20])
+
+# Gesture for every 4-bit closed-finger pattern (index finger is the highest bit)
+GESTURES = np.full(16, "Unknown", dtype=object)
+GESTURES[0b1111] = "rock"
+GESTURES[0b0000] = "paper"
+GESTURES[0b0011] = "scissors"
+GESTURES[0b0110] = "Restart"
+GESTURES[0b1011] = "Explicit"
+FINGER_BITS = np.array([8, 4, 2, 1])
+
+
+def closed_fingers(landmarks, previous=None, margin=0.0):
+    """
+    Closed state of every finger for landmarks of shape (..., 21, 2), e.g. all
+    hands in a frame or a whole recorded sequence. Returns a (..., 4) bool array.
+    A finger is closed when the tip points back towards the wrist.
+
+    With previous (the last closed states, same shape as the result) and a
+    margin, the test has hysteresis: a finger has to go past cos(theta) = -margin
+    to close and past +margin to open again, so jitter around the threshold does
+    not flip it.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    pips = landmarks[..., FINGER_PIPS, :]
+    v1 = pips - landmarks[..., :1, :]
+    v2 = landmarks[..., FINGER_TIPS, :] - pips
+    dot = np.einsum("...i,...i->...", v1, v2)
+    if previous is None or not margin:
+        # cos(theta) < 0 has the same sign as the dot product, so the norms are not needed
+        return dot < 0
+    cos = dot / np.maximum(np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1), 1e-6)
+    return np.where(previous, cos < margin, cos < -margin)
+
+
+def classify_batch(landmarks):
+    """Gesture names for landmarks of shape (..., 21, 2), computed in one vectorized pass."""
+    return GESTURES[closed_fingers(landmarks) @ FINGER_BITS]
+
+
+def as_landmark_array(landmarks):
+    """Accept a (21, 2) array or the [id, x, y] lists returned by find_position."""
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    if landmarks.shape[-1] == 3:
+        landmarks = landmarks[..., 1:]
+    return landmarks
 
 
 def get_closed_fingers(landmarks):
-    finger_indexes = [
-        [ 5,  6,  7,  8],
-        [ 9, 10, 11, 12],
-        [13, 14, 15, 16],
-        [17, 18, 19, 20]
-    ]
-
-    finger_statuses = []
-    for _, indices in enumerate(finger_indexes):
-        status = is_finger_closed([landmarks[idx] for idx in indices], wrist = landmarks[0])
-        finger_statuses.append(status)
-    
-    return finger_statuses
+    return closed_fingers(as_landmark_array(landmarks)).tolist()
 
 
 def finger_combo(landmarks):
-    finger_statuses = get_closed_fingers(landmarks)
-
-    if finger_statuses == [True, True, True, True]:
-        return "rock"
-    elif finger_statuses == [False, False, False, False]:
-        return "paper"
-    elif finger_statuses == [False, False, True, True]:
-        return "scissors"
-    elif finger_statuses == [False, True, True, False]:
-        return "Restart"
-    elif finger_statuses == [True, False, True, True]:
-        return "Explicit"
-    else:
-        return "Unknown"
+    return classify_batch(as_landmark_array(landmarks))
 
 
 def check_locked_gesture(past_gestures, limit=60):
@@ -91,21 +250,301 @@ def check_locked_gesture(past_gestures, limit=60):
         return list(unique_gestures.keys())[0]
 
 
-def bot_choice():
-    return np.random.choice(["rock", "paper", "scissors"])
+class OneEuroFilter:
+    """
+    One-Euro filter (Casiez et al., CHI 2012) over a fixed-shape array, e.g. the
+    (slots, 21, 2) landmarks of every tracked hand, updated in one vectorized
+    step per frame. The cutoff frequency rises with the filtered speed, so a
+    hand held still is smoothed heavily while fast moves lag very little.
+    min_cutoff is in Hz and beta in 1/(units per second). All state and scratch
+    arrays are allocated up front; update() writes into them in place.
+    """
+
+    def __init__(self, shape, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = np.zeros(shape, dtype=np.float32)
+        self.speed = np.zeros(shape, dtype=np.float32)
+        self.alpha = np.zeros(shape, dtype=np.float32)
+        self.scratch = np.zeros(shape, dtype=np.float32)
+        self.primed = np.zeros(shape[:1], dtype=bool)  # Rows holding a value to filter against
+        self.fresh = np.zeros(shape[:1], dtype=bool)
+        self.rows = np.zeros(shape[:1], dtype=bool)
+        self.all_rows = np.ones(shape[:1], dtype=bool)
+        self.last_time = None
+
+    def reset(self, rows=None):
+        """Forget the state of the given rows (default: all), so they restart from their next value."""
+        if rows is None:
+            self.primed[:] = False
+            self.last_time = None
+        else:
+            self.primed[rows] = False
 
+    @staticmethod
+    def _alpha(cutoff, dt):
+        # Smoothing factor of an exponential filter with the given cutoff frequency
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+    def update(self, values, now, valid=None):
+        """
+        Filter one frame of values (same shape as the state) taken at time now
+        (seconds). Rows where valid is False are skipped and reset. Returns the
+        filtered state array (updated in place, so copy it to keep a frame).
+        """
+        valid = self.all_rows if valid is None else valid
+        dt = now - self.last_time if self.last_time is not None else 0.0
+        self.last_time = now
+
+        # Rows seen for the first time (or again after a gap) start from their value
+        np.greater(valid, self.primed, out=self.fresh)
+        fresh = self.fresh[:, None, None]
+        np.copyto(self.value, values, where=fresh)
+        np.copyto(self.speed, 0, where=fresh)
+        if dt > 0:
+            np.logical_and(valid, self.primed, out=self.rows)
+            rows = self.rows[:, None, None]
+            # Speed estimate, itself smoothed with the fixed d_cutoff
+            np.subtract(values, self.value, out=self.scratch)
+            self.scratch /= dt
+            self.scratch -= self.speed
+            self.scratch *= self._alpha(self.d_cutoff, dt)
+            self.scratch *= rows
+            self.speed += self.scratch
+            # Cutoff rising with the speed, then the smoothing factor of every value
+            np.abs(self.speed, out=self.alpha)
+            self.alpha *= self.beta
+            self.alpha += self.min_cutoff
+            self.alpha *= 2 * np.pi * dt
+            np.add(self.alpha, 1, out=self.scratch)
+            self.alpha /= self.scratch
+            np.subtract(values, self.value, out=self.scratch)
+            self.scratch *= self.alpha
+            self.scratch *= rows
+            self.value += self.scratch
+        self.primed[:] = valid
+        return self.value
+
+
+class HandFilter:
+    """
+    Temporal filter stage between detection and classification for a fixed
+    number of hand slots: One-Euro smoothing of all landmarks plus a
+    hysteresis margin on the per-finger angle test, with the state of every
+    slot kept in preallocated arrays.
+
+    The defaults come from benchmarks.lock_latency on synthetic jitter. beta=0.2
+    (rather than OneEuroFilter's 0.05) opens the filter quickly when fingers
+    move. At 4 px jitter a gesture then locks as fast on average as on raw
+    landmarks, with a lower p95 and no missed locks, and at 8 px about two
+    frames sooner with fewer missed locks. The trade-off: with clean landmarks
+    (1-2 px) the filter still adds about 0.4 frames to the time to lock.
+    """
+
+    def __init__(self, slots=2, margin=0.05, min_cutoff=1.0, beta=0.2, **filter_kwargs):
+        self.filter = OneEuroFilter((slots, 21, 2), min_cutoff=min_cutoff, beta=beta, **filter_kwargs)
+        self.margin = margin
+        self.raw = np.zeros((slots, 21, 2), dtype=np.float32)
+        self.valid = np.zeros(slots, dtype=bool)
+        self.closed = np.zeros((slots, 4), dtype=bool)
+        # Whether closed holds the state of the slot's current hand
+        self.seeded = np.zeros(slots, dtype=bool)
+
+    def reset(self):
+        self.filter.reset()
+        self.closed[:] = False
+        self.seeded[:] = False
+
+    def update(self, landmarks, hands, now):
+        """
+        landmarks are the (n, 21, 2) hands of one detection pass and hands the
+        index of each slot's hand in it (or -1, as from PlayerTracker.assign).
+        Returns the gesture of every slot ("Unknown" for empty slots).
+        """
+        for slot, hand in enumerate(hands):
+            self.valid[slot] = hand >= 0
+            if hand >= 0:
+                self.raw[slot] = landmarks[hand]
+        smoothed = self.filter.update(self.raw, now, self.valid)
+        closed = closed_fingers(smoothed, self.closed, self.margin)
+        # A slot that lost its hand has no previous state, so its next hand gets
+        # the plain threshold test instead of the hysteresis around "open"
+        fresh = self.valid & ~self.seeded
+        if fresh.any():
+            closed[fresh] = closed_fingers(smoothed[fresh])
+        self.closed[:] = closed & self.valid[:, None]
+        self.seeded[:] = self.valid
+        gestures = GESTURES[closed @ FINGER_BITS]
+        gestures[~self.valid] = "Unknown"
+        return gestures.tolist()
+
+
+class GestureStabilizer:
+    """
+    Streaming replacement for check_locked_gesture. Tracks the run length of the
+    current gesture as frames arrive, so the locked gesture is known in O(1).
+
+    limit is the number of consecutive frames needed to lock, thresholds can
+    override it per gesture and debounce is how many frames of a different
+    gesture are tolerated before the current run is broken. Like
+    check_locked_gesture, nothing locks until more than limit frames have been
+    seen since reset(), so the first lock takes limit + 1 frames.
+    """
+
+    def __init__(self, limit=5, thresholds=None, debounce=0, window=60, stats_size=256):
+        self.limit = limit
+        self.thresholds = thresholds or {}
+        self.debounce = debounce
+        self.history = collections.deque(maxlen=window)
+        self.lock_times = collections.deque(maxlen=stats_size)
+        self.reset()
+
+    def reset(self):
+        self.history.clear()
+        self.frames = 0
+        self.current, self.run, self.run_start = None, 0, 0.0
+        self.candidate, self.candidate_run, self.candidate_start = None, 0, 0.0
+        self.locked = False
+
+    def update(self, gesture, now=None):
+        """Add the gesture seen in this frame and return the locked gesture or False."""
+        now = time.perf_counter() if now is None else now
+        self.history.append(gesture)
+        self.frames += 1
+
+        if gesture == self.current:
+            self.run += 1
+            self.candidate_run = 0
+        else:
+            if gesture == self.candidate and self.candidate_run:
+                self.candidate_run += 1
+            else:
+                self.candidate, self.candidate_run, self.candidate_start = gesture, 1, now
+            # A different gesture held past the debounce window starts a new run
+            if self.candidate_run > self.debounce:
+                self.current, self.run, self.run_start = self.candidate, self.candidate_run, self.candidate_start
+                self.candidate_run = 0
+                self.locked = False
+
+        threshold = self.thresholds.get(self.current, self.limit)
+        if not self.locked and self.run >= threshold and self.frames > threshold:
+            self.locked = self.current
+            self.lock_times.append((self.current, now - self.run_start, self.run))
+        return self.locked
+
+    def stats(self):
+        """Time-to-lock statistics in milliseconds over the recorded locks."""
+        if not self.lock_times:
+            return {"locks": 0}
+        times = np.array([t for _, t, _ in self.lock_times]) * 1000
+        return {
+            "locks": len(times),
+            "mean_ms": float(times.mean()),
+            "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)),
+            "max_ms": float(times.max()),
+        }
+
+
+class PlayerTracker:
+    """
+    Assigns the hands found in one detection pass to stable player slots.
+
+    A slot follows the hand whose center (the mean of its 21 landmarks, not the
+    wrist) is closest to the slot's last center, with distances in hand sizes
+    and a penalty when the handedness label changes. Empty slots
+    are filled by position: with two players slot 0 takes the hand on the left
+    of the camera frame (the right of the mirrored preview) and slot 1 the hand
+    on the right. A slot forgets its hand after max_missing frames without one.
+    """
+
+    def __init__(self, players=2, max_missing=15, handedness_penalty=0.5):
+        self.players = players
+        self.max_missing = max_missing
+        self.handedness_penalty = handedness_penalty
+        self.centers = [None] * players
+        self.labels = [None] * players
+        self.missing = [0] * players
+        self.slots = [-1] * players
+
+    def reset(self):
+        self.centers = [None] * self.players
+        self.labels = [None] * self.players
+        self.missing = [0] * self.players
+        self.slots = [-1] * self.players
+
+    def has_empty_slot(self):
+        """Whether a slot got no hand in the last assignment, so the detector should search the whole frame."""
+        return -1 in self.slots
+
+    def _cost(self, slot, center, label, hand_size, width):
+        if self.centers[slot] is not None:
+            cost = np.linalg.norm(center - self.centers[slot]) / hand_size
+            if label and self.labels[slot] and label != self.labels[slot]:
+                cost += self.handedness_penalty
+            return cost
+        # Free slot: prefer the hand on the slot's side of the frame
+        if self.players == 2 and (center[0] < width / 2) != (slot == 0):
+            return 1.5
+        return 1.0
+
+    def assign(self, landmarks, handedness=(), width=1):
+        """Return, for every slot, the index of its hand in landmarks or -1."""
+        slots = [-1] * self.players
+        if len(landmarks):
+            centers = landmarks.mean(axis=1)
+            hand_size = max(float(np.linalg.norm(landmarks[:, 9] - landmarks[:, 0], axis=1).mean()), 1.0)
+            labels = list(handedness) + [None] * (len(landmarks) - len(handedness))
+
+            cost = np.array([[self._cost(slot, centers[hand], labels[hand], hand_size, width)
+                              for hand in range(len(landmarks))] for slot in range(self.players)])
+            # Greedy: the cheapest slot-hand pair first, in O(players * hands) per pair, so any
+            # number of slots stays cheap. A pair costing as much as an empty slot (2.0) is not made
+            while True:
+                slot, hand = np.unravel_index(np.argmin(cost), cost.shape)
+                if cost[slot, hand] >= 2.0:
+                    break
+                slots[slot] = int(hand)
+                cost[slot, :] = np.inf
+                cost[:, hand] = np.inf
+
+        for slot, hand in enumerate(slots):
+            if hand >= 0:
+                self.centers[slot] = landmarks[hand].mean(axis=0)
+                self.labels[slot] = handedness[hand] if hand < len(handedness) else None
+                self.missing[slot] = 0
+            else:
+                self.missing[slot] += 1
+                if self.missing[slot] > self.max_missing:
+                    self.centers[slot], self.labels[slot] = None, None
+        self.slots = slots
+        return slots
+
+
+MOVES = ("rock", "paper", "scissors")
+MOVE_INDEX = {move: i for i, move in enumerate(MOVES)}
+
+# OUTCOMES[player, bot] for move indexes: 0 draw, 1 player wins, 2 bot wins.
+# Every move beats the one before it in MOVES, cyclically
+OUTCOMES = (np.arange(3)[:, None] - np.arange(3)[None, :]) % 3
+WINNERS = ("Draw", "Player", "Bot")
 
 def check_winner(player_choice, bot_choice):
-    if player_choice == bot_choice:
-        return "Draw"
-    elif player_choice == "rock" and bot_choice == "scissors":
-        return "Player"
-    elif player_choice == "scissors" and bot_choice == "paper":
-        return "Player"
-    elif player_choice == "paper" and bot_choice == "rock":
-        return "Player"
-    else:
-        return "Bot"
+    player, bot = MOVE_INDEX.get(player_choice), MOVE_INDEX.get(bot_choice)
+    if player is None or bot is None:
+        return "Draw" if player_choice == bot_choice else "Bot"
+    return WINNERS[OUTCOMES[player, bot]]
     
 
-detector = HandDetector(detection_con=0.75)
+_detector = None
+
+
+def __getattr__(name):
+    # utils.detector used to be built at import time; now it is built on first use
+    global _detector
+    if name == "detector":
+        if _detector is None:
+            _detector = HandDetector(detection_con=0.75, tracking=True)
+        return _detector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")